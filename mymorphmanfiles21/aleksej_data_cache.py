@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Per-language marshal cache of the tables in aleksej_morphemizer_data.
+
+Importing aleksej_morphemizer_data executes the dict and set literals of every language (and of TOTAL, which repeats
+most of them). The tables of a language are instead written to 'user_files/aleksej_data/<language>.<hash>.marshal'
+the first time they are needed, and later loaded from there alone. The hash is that of the source file, so editing
+aleksej_morphemizer_data.py rebuilds the cache on next use. Without the source (only the cache was copied) the newest
+cache of the language is used.
+"""
+import glob
+import hashlib
+import marshal
+import os
+from typing import Dict, Optional
+
+from .util import printf
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(ADDON_DIR, 'aleksej_morphemizer_data.py')
+CACHE_DIR = os.path.join(ADDON_DIR, 'user_files', 'aleksej_data')
+
+# without the language suffix
+TABLE_NAMES = ('FULLWORD_DICT', 'ENDING_DICT', 'ENDING_DICT_CUR_SET', 'BAD_BASE_FORMS_EVEN_FOR_PAIRS',
+               'BAD_BASE_FORMS_CASE_INSENS', 'BAD_BASE_FORMS_CASE_SENS', 'TRANSLATION_TABLE')
+SHARED_NAMES = ('CLOZE_MARKS', 'PAIRS_WORDSEPARATOR')
+
+_source_hash = None
+
+
+def sourceHash() -> str:
+    global _source_hash
+    if _source_hash is None:
+        with open(SOURCE_PATH, 'rb') as f:
+            _source_hash = hashlib.sha1(f.read()).hexdigest()[:16]
+    return _source_hash
+
+
+def cachePath(language: str) -> str:
+    return os.path.join(CACHE_DIR, '%s.%s.marshal' % (language, sourceHash()))
+
+
+def newestCachePath(language: str) -> Optional[str]:
+    """The most recently written cache of 'language', whatever source it was made from"""
+    paths = glob.glob(os.path.join(glob.escape(CACHE_DIR), glob.escape(language) + '.*.marshal'))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def tablesFromSource(language: str) -> Dict[str, object]:
+    from . import aleksej_morphemizer_data as data
+    tables = {name: getattr(data, '%s_%s' % (name, language)) for name in TABLE_NAMES}
+    tables.update((name, getattr(data, name)) for name in SHARED_NAMES)
+    return tables
+
+
+def writeCache(language: str, tables: Dict[str, object]) -> None:
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+    path = cachePath(language)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        marshal.dump(tables, f)
+    os.replace(tmp_path, path)
+    # caches of older versions of the source
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(language + '.') and os.path.join(CACHE_DIR, name) != path:
+            os.remove(os.path.join(CACHE_DIR, name))
+
+
+def loadAleksejTables(language: str) -> Dict[str, object]:
+    """
+    The tables of one language in aleksej_morphemizer_data (by name without the suffix) and the shared ones. Read from
+    the cache, or from the source if the cache is missing or out of date (the cache is then rebuilt).
+    """
+    try:
+        path = cachePath(language)
+        has_source = True
+    except IOError:  # no source, e.g. only the cache was copied
+        path = newestCachePath(language)
+        has_source = False
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                return marshal.load(f)
+        except (EOFError, ValueError, TypeError):  # truncated or written by another Python version
+            pass
+
+    tables = tablesFromSource(language)
+    if has_source:
+        try:
+            writeCache(language, tables)
+        except (IOError, OSError, ValueError) as e:  # read-only add-on folder, or a table that marshal can't write
+            printf('Could not cache the %s tables of the Aleksej morphemizers: %s' % (language, e))
+    return tables
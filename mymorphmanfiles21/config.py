@@ -9,6 +9,9 @@ default = {
     'path_ext': os.path.join(mw.pm.profileFolder(), 'dbs21', 'external.db'),
     'path_frequency': os.path.join(mw.pm.profileFolder(), 'dbs21', 'frequency.txt'),
     'path_all': os.path.join(mw.pm.profileFolder(), 'dbs21', 'all.db'),
+    'path_all_frozen': os.path.join(mw.pm.profileFolder(), 'dbs21', 'all.frozen.db'),
+    # more dbs that are queried together with all.db and external.db, like frequency corpora
+    'paths_overlay': [],
     'path_mature': os.path.join(mw.pm.profileFolder(), 'dbs21', 'mature.db'),
     'path_known': os.path.join(mw.pm.profileFolder(), 'dbs21', 'known.db'),
     'path_seen': os.path.join(mw.pm.profileFolder(), 'dbs21', 'seen.db'),
@@ -53,6 +56,58 @@ default = {
     'loadAllDb': True,
     'saveDbs': True,     # whether to save all.db, known.db, mature.db, and seen.db
     'saveSQLite': False,  # save the data also in an sqlite database
+    # 'pickle' or 'columnar'. a columnar all.db is mmap'ed and only read where it is queried, instead of being
+    # deserialized as a whole. both formats are read regardless of this setting
+    'all.db format': 'pickle',
+    # save all.db as a base snapshot plus a journal of the changes of each recalc, instead of rewriting it every time.
+    # the journal is merged into a new base when it gets larger than this ratio times the base. note that tools which
+    # read all.db directly only see the base
+    'journal all.db': False,
+    'all.db journal compaction ratio': 0.5,
+    # store a hash of each field instead of its text in all.db (the text is only used to notice changed fields).
+    # when enabled, the existing all.db is converted on the next recalc and the text only comes back by deleting all.db.
+    # tools that show loc.fieldValue get None
+    'hash field values in all.db': False,
+    # after a recalc keep only a compact read-only view of all.db (maturity and frequency per morph) in memory. it
+    # answers highlighting and the skip options, but not other add-ons that need all of all.db (locations, .db).
+    # with 'recalc in separate process' all.db is otherwise loaded in full when something first asks for it
+    'freeze all.db after recalc': False,
+    # recalc in a separate Python process against a snapshot of the collection, so all.db and the memory needed to
+    # build it are never held by Anki. only the resulting note/card updates are sent back
+    'recalc in separate process': False,
+    'path_recalc_snapshot': os.path.join(mw.pm.profileFolder(), 'dbs21', 'recalc_snapshot.anki2'),
+    # python interpreter for out-of-process work (the options above and the '... processes' ones below), one that can
+    # import anki and aqt. None uses the one Anki runs on, which packaged Anki builds don't have: there these options
+    # do nothing until this is set
+    'path_python': None,
+    # new and changed fields are given to the morphemizer in batches of this many. Mecab parses a batch in one
+    # round-trip to its process
+    'morphemizer batch size': 200,
+    # parse large Japanese batches in this many processes, each with its own mecab. 1 parses in Anki's process
+    'mecab processes': 1,
+    # same for Chinese (jieba)
+    'jieba processes': 1,
+    # analyze the input files of the readability analyzer in this many processes. each loads known.db once
+    'readability processes': 1,
+    # the readability analyzer keeps the morphs of each input file here, and parses a file again only when it or the
+    # morphemizer changed. None disables the cache
+    'path_readability_cache': os.path.join(mw.pm.profileFolder(), 'dbs21', 'readability_cache'),
+    # keep the morphemes of this many recently parsed expressions in memory, 0 disables the cache. expressions longer
+    # than the max length (whole articles) aren't cached
+    'morpheme cache size': 0,
+    'morpheme cache max expression length': 200,
+    # ScriptDispatchMorphemizer: the morphemizer for the runs of each script in a mixed field. Han is 'Japanese' in
+    # expressions with kana, 'Chinese' otherwise. runs of other scripts, and expressions without letters, go to
+    # 'other'. None leaves the runs of a script out
+    'script dispatch morphemizers': {
+        'Latin': 'SpaceMorphemizerAleksejEn',
+        'Cyrillic': 'SpaceMorphemizerAleksejRu',
+        'Greek': 'SpaceMorphemizer',
+        'Japanese': 'MecabMorphemizer',
+        'Chinese': 'JiebaMorphemizer',
+        'Hangul': 'SpaceMorphemizer',
+        'other': 'SpaceMorphemizerAleksej',
+    },
     # only these can have model overrides
     # whether to modify card Due times based on MorphManIndex. does nothing if relevant notes aren't enabled
     'set due based on mmi': True,
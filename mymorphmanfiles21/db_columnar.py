@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar binary format for all.db.
+
+The pickle format has to be deserialized completely before all.db can be used. This format stores a string table,
+the morphs as string ids, the location columns and morph -> location lists as flat arrays, so a file can be mmap'ed
+and queried right away; only the pages that a query touches are read.
+
+Layout: magic, a table of (offset, length) of every section, then the sections (8 byte aligned), each a flat array
+in native byte order:
+    str_starts, str_blob            string table: byte offsets into the utf-8 blob
+    morphs                          6 string ids per morph (norm, base, inflected, read, pos, subPos), sorted by norm
+    morph_loc_starts, morph_locs    location ids of each morph
+    loc_*                           one entry per AnkiDeck/HashedAnkiDeck location
+    other_locs                      pickled list of locations of other types, their ids follow the AnkiDeck ones
+"""
+import mmap
+import os
+import pickle
+import struct
+from array import array
+
+from .locations import HashedAnkiDeck
+from .morphemes import AnkiDeck, MorphDb, Morpheme, altIncludesMorpheme
+from .preferences import get_preference as cfg
+
+MAGIC = b'MMCOL1\0\0'
+NONE = 0xFFFFFFFF  # string id of None
+KIND_ANKIDECK, KIND_HASHED = 0, 1
+HASH_SIZE = 8
+
+SECTIONS = (
+    ('str_starts', 'Q'),
+    ('str_blob', 'B'),
+    ('morphs', 'I'),
+    ('morph_loc_starts', 'Q'),
+    ('morph_locs', 'I'),
+    ('loc_kind', 'B'),
+    ('loc_note', 'q'),
+    ('loc_guid', 'I'),
+    ('loc_field', 'I'),
+    ('loc_value', 'I'),
+    ('loc_hash', 'B'),
+    ('loc_weight', 'd'),
+    ('loc_maturity', 'd'),
+    ('loc_mat_starts', 'Q'),
+    ('loc_mats', 'd'),
+    ('other_locs', 'B'),
+)
+MORPH_FIELDS = 6
+
+
+def isColumnar(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except IOError:
+        return False
+
+
+def saveColumnar(db, path):
+    # type: (MorphDb, str) -> None
+    strings = {}
+    str_blob = bytearray()
+    str_starts = array('Q', [0])
+
+    def sid(s):
+        if s is None:
+            return NONE
+        i = strings.get(s, None)
+        if i is None:
+            i = strings[s] = len(str_starts) - 1
+            str_blob.extend(s.encode('utf-8'))
+            str_starts.append(len(str_blob))
+        return i
+
+    anki_locs, other_locs = {}, {}
+    for locs in db.db.values():
+        for loc in locs:
+            if isinstance(loc, AnkiDeck):
+                anki_locs.setdefault(loc, len(anki_locs))
+            else:
+                other_locs.setdefault(loc, len(other_locs))
+    loc_ids = dict(anki_locs)
+    for loc, i in other_locs.items():
+        loc_ids[loc] = len(anki_locs) + i
+
+    cols = {name: array(fmt) for name, fmt in SECTIONS}
+    cols['morph_loc_starts'].append(0)
+    cols['loc_mat_starts'].append(0)
+    for m in sorted(db.db, key=lambda m: m.norm):
+        cols['morphs'].extend(sid(s) for s in (m.norm, m.base, m.inflected, m.read, m.pos, m.subPos))
+        cols['morph_locs'].extend(loc_ids[loc] for loc in db.db[m])
+        cols['morph_loc_starts'].append(len(cols['morph_locs']))
+
+    for loc in sorted(anki_locs, key=anki_locs.get):
+        hashed = isinstance(loc, HashedAnkiDeck)
+        cols['loc_kind'].append(KIND_HASHED if hashed else KIND_ANKIDECK)
+        cols['loc_note'].append(loc.noteId)
+        cols['loc_guid'].append(sid(loc.guid))
+        cols['loc_field'].append(sid(loc.fieldName))
+        cols['loc_value'].append(sid(loc.fieldValue))
+        cols['loc_hash'].extend(loc.fieldHash if hashed else bytes(HASH_SIZE))
+        cols['loc_weight'].append(loc.weight)
+        cols['loc_maturity'].append(loc.maturity)
+        cols['loc_mats'].extend(loc.maturities)
+        cols['loc_mat_starts'].append(len(cols['loc_mats']))
+
+    cols['str_starts'] = str_starts
+    cols['str_blob'] = array('B', bytes(str_blob))
+    cols['other_locs'] = array('B', pickle.dumps(sorted(other_locs, key=other_locs.get), -1))
+
+    par = os.path.split(path)[0]
+    if not os.path.exists(par):
+        os.makedirs(par)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        header_size = len(MAGIC) + 16 * len(SECTIONS)
+        offset, table = _align(header_size), []
+        for name, _ in SECTIONS:
+            size = len(cols[name]) * cols[name].itemsize
+            table.append((offset, size))
+            offset = _align(offset + size)
+        f.write(MAGIC)
+        for entry in table:
+            f.write(struct.pack('<QQ', *entry))
+        for (name, _), (offset, _) in zip(SECTIONS, table):
+            f.write(bytes(offset - f.tell()))
+            cols[name].tofile(f)
+    os.replace(tmp_path, path)
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class ColumnarMorphDb:
+    """
+    Read-only, lazily decoded view of a columnar all.db. Answers the queries of a MorphDb that highlight() and
+    updateNotes() use; toMorphDb() builds a full MorphDb for the recalc.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise IOError('%s is not a columnar all.db' % path)
+        view = memoryview(self._mm)
+        self._cols = {}
+        for i, (name, fmt) in enumerate(SECTIONS):
+            offset, size = struct.unpack_from('<QQ', self._mm, len(MAGIC) + 16 * i)
+            self._cols[name] = view[offset:offset + size].cast(fmt)
+        self.n_morphs = len(self._cols['morph_loc_starts']) - 1
+        self.n_anki_locs = len(self._cols['loc_kind'])
+        self._morph_cache = {}
+        self._other_locs = None
+
+    def close(self):
+        for col in self._cols.values():
+            col.release()
+        self._cols = {}
+        self._mm.close()
+
+    def __len__(self):
+        return self.n_morphs
+
+    # Decoding
+    def _str(self, i):
+        if i == NONE:
+            return None
+        starts = self._cols['str_starts']
+        return str(self._cols['str_blob'][starts[i]:starts[i + 1]], 'utf-8')
+
+    def _morph(self, i):
+        m = self._morph_cache.get(i, None)
+        if m is None:
+            ids = self._cols['morphs'][MORPH_FIELDS * i:MORPH_FIELDS * (i + 1)]
+            m = self._morph_cache[i] = Morpheme(*[self._str(s) for s in ids])
+        return m
+
+    def _norm(self, i):
+        return self._str(self._cols['morphs'][MORPH_FIELDS * i])
+
+    def _locIds(self, i):
+        starts = self._cols['morph_loc_starts']
+        return self._cols['morph_locs'][starts[i]:starts[i + 1]]
+
+    def _otherLocs(self):
+        if self._other_locs is None:
+            self._other_locs = pickle.loads(self._cols['other_locs'])
+        return self._other_locs
+
+    def _loc(self, j):
+        if j >= self.n_anki_locs:
+            return self._otherLocs()[j - self.n_anki_locs]
+        c = self._cols
+        mats = list(c['loc_mats'][c['loc_mat_starts'][j]:c['loc_mat_starts'][j + 1]])
+        nid, guid, field = c['loc_note'][j], self._str(c['loc_guid'][j]), self._str(c['loc_field'][j])
+        if c['loc_kind'][j] == KIND_HASHED:
+            fieldHash = bytes(c['loc_hash'][HASH_SIZE * j:HASH_SIZE * (j + 1)])
+            return HashedAnkiDeck.withHash(nid, field, fieldHash, guid, mats, c['loc_weight'][j])
+        return AnkiDeck(nid, field, self._str(c['loc_value'][j]), guid, mats, c['loc_weight'][j])
+
+    def _locMaturity(self, j):
+        if j >= self.n_anki_locs:
+            return self._otherLocs()[j - self.n_anki_locs].maturity
+        return self._cols['loc_maturity'][j]
+
+    # Queries
+    def _variants(self, m):
+        """Indexes of the morphs that match 'm'. Morphs are sorted by norm, and the group key starts with it"""
+        lo, hi = 0, self.n_morphs
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._norm(mid) < m.norm:
+                lo = mid + 1
+            else:
+                hi = mid
+        gk, variants = m.getGroupKey(), []
+        for i in range(lo, self.n_morphs):
+            alt = self._morph(i)
+            if alt.norm != m.norm:
+                break
+            if alt.getGroupKey() == gk and altIncludesMorpheme(alt, m):
+                variants.append(i)
+        return variants
+
+    def matches(self, m):
+        return len(self._variants(m)) > 0
+
+    def getMatchingLocs(self, m):
+        return {self._loc(j) for j in self._matchingLocIds(m)}
+
+    def _matchingLocIds(self, m):
+        ids = set()
+        for i in self._variants(m):
+            ids.update(self._locIds(i))
+        return ids
+
+    def frequency(self, m):
+        return len(self._matchingLocIds(m))
+
+    def maxMaturity(self, m):
+        return max((self._locMaturity(j) for j in self._matchingLocIds(m)), default=0)
+
+    def toMorphDb(self):
+        # type: () -> MorphDb
+        strs = [self._str(i) for i in range(len(self._cols['str_starts']) - 1)] + [None]
+        ids = self._cols['morphs']
+        locs = [self._loc(j) for j in range(self.n_anki_locs)] + self._otherLocs()
+        db = MorphDb()
+        for i in range(self.n_morphs):
+            m = Morpheme(*[strs[s] if s != NONE else None for s in ids[MORPH_FIELDS * i:MORPH_FIELDS * (i + 1)]])
+            db.addMLs1(m, {locs[j] for j in self._locIds(i)})
+        return db
+
+
+def loadMorphDb(path, ignoreErrors=True):
+    # type: (str, bool) -> MorphDb
+    """Loads a MorphDb saved in either format"""
+    if isColumnar(path):
+        view = ColumnarMorphDb(path)
+        try:
+            return view.toMorphDb()
+        finally:
+            view.close()
+    return MorphDb(path, ignoreErrors=ignoreErrors)
+
+
+def saveMorphDb(db, path):
+    # type: (MorphDb, str) -> None
+    """Saves a MorphDb in the format chosen by 'all.db format'"""
+    if cfg('all.db format') == 'columnar':
+        saveColumnar(db, path)
+    else:
+        db.save(path)
+
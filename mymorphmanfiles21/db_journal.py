@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Journaled saving of all.db.
+
+Instead of rewriting all.db after every recalc, the changes of a run (new and changed locations, changed maturities)
+are appended to 'all.db.journal'. all.db itself is the base snapshot; loading replays the journal on top of it. When
+the journal gets large compared to the base, both are compacted into a new base.
+
+Each entry of the journal is a frame: the length and CRC-32 of the data, then the pickled AllDbDelta compressed with
+zlib. A run that is interrupted while appending leaves a torn last frame, which loading cuts off.
+"""
+import os
+import pickle
+import struct
+import zlib
+
+from .db_columnar import loadMorphDb, saveMorphDb
+from .locations import setMaturities
+from .preferences import get_preference as cfg
+from .util import printf
+
+
+def locFid(loc):
+    return loc.noteId, loc.guid, loc.fieldName
+
+
+class AllDbDelta:
+    """The changes one mkAllDb() run made to all.db"""
+
+    def __init__(self):
+        self.locations = {}  # fid -> (loc, morphs); replaces the location with the same fid
+        self.maturities = {}  # fid -> maturities
+
+    def locationChanged(self, loc, ms):
+        self.locations[locFid(loc)] = (loc, ms)
+
+    def maturitiesChanged(self, loc):
+        self.maturities[locFid(loc)] = loc.maturities
+
+    def __len__(self):
+        return len(self.locations) + len(self.maturities)
+
+    def apply(self, locDb, fidDb):
+        for fid, mats in self.maturities.items():
+            loc = fidDb.get(fid, None)
+            if loc is not None:
+                setMaturities(loc, mats)
+        for fid, (loc, ms) in self.locations.items():
+            old = fidDb.pop(fid, None)
+            if old is not None:
+                locDb.pop(old, None)
+            if ms:
+                locDb[loc] = ms
+                fidDb[fid] = loc
+
+
+def journalPath(path):
+    return path + '.journal'
+
+
+FRAME_HEADER = struct.Struct('<QI')
+
+
+def writeDelta(f, delta):
+    # type: (BinaryIO, AllDbDelta) -> None
+    data = zlib.compress(pickle.dumps(delta, -1))
+    f.write(FRAME_HEADER.pack(len(data), zlib.crc32(data)) + data)
+
+
+def readDeltas(f):
+    # type: (BinaryIO) -> Iterator[Tuple[AllDbDelta, int]]
+    """Yields (delta, offset of the end of its frame) for the frames of the journal 'f' up to the first damaged one"""
+    end = 0
+    while True:
+        header = f.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        size, crc = FRAME_HEADER.unpack(header)
+        data = f.read(size)
+        if len(data) < size or zlib.crc32(data) != crc:
+            return
+        try:
+            delta = pickle.loads(zlib.decompress(data))
+        except (zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+            return
+        end += FRAME_HEADER.size + size
+        yield delta, end
+
+
+# paths of all.db whose journal was damaged when it was loaded. The next save compacts it instead of appending
+_damaged_journals = set()
+
+
+def loadJournaled(path, ignoreErrors=True):
+    # type: (str, bool) -> MorphDb
+    """Loads the base all.db and replays its journal"""
+    db = loadMorphDb(path, ignoreErrors=ignoreErrors)
+    jpath = journalPath(path)
+    if not os.path.exists(jpath):
+        return db
+
+    locDb = db.locDb()
+    fidDb = {locFid(loc): loc for loc in locDb if hasattr(loc, 'guid')}
+    n = end = 0
+    with open(jpath, 'rb') as f:
+        for delta, end in readDeltas(f):
+            delta.apply(locDb, fidDb)
+            n += 1
+    if end < os.path.getsize(jpath):  # a run that was interrupted while saving
+        printf('all.db journal is damaged after entry %d, the rest is cut off' % n)
+        _damaged_journals.add(path)
+        try:
+            with open(jpath, 'r+b') as f:
+                f.truncate(end)
+        except OSError as e:
+            printf('Could not cut off the damaged all.db journal: %s' % e)
+    db.clear()
+    db.addFromLocDb(locDb)
+    printf('Replayed %d all.db journal entries' % n)
+    return db
+
+
+def saveJournaled(db, path, delta=None):
+    # type: (MorphDb, str, AllDbDelta) -> None
+    """
+    Appends 'delta' to the journal of all.db at 'path'. Without a delta (all.db was built from scratch), or if there is
+    no base yet, or if the journal was damaged or outgrew 'all.db journal compaction ratio' times the base, 'db' is
+    saved as the new base and the journal is removed.
+    """
+    jpath = journalPath(path)
+    if delta is not None and os.path.exists(path) and path not in _damaged_journals:
+        if len(delta):
+            with open(jpath, 'ab') as f:
+                writeDelta(f, delta)
+        journal_size = os.path.getsize(jpath) if os.path.exists(jpath) else 0
+        if journal_size <= cfg('all.db journal compaction ratio') * os.path.getsize(path):
+            return
+        printf('Compacting all.db journal')
+
+    saveMorphDb(db, path)
+    if os.path.exists(jpath):
+        os.remove(jpath)
+    _damaged_journals.discard(path)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Compact read-only view of all.db for queries after a recalc.
+
+Once the notes are updated, all.db is only asked "how mature is this morph" (highlight()) and "how often does it
+occur". A full MorphDb answers that with every location object and the morph/location sets behind it. The frozen
+view keeps one entry per morph variant: the group keys in a sorted list, the variants and their max maturity and
+location count in parallel arrays. The group keys depend on 'Option_IgnoreGrammarPosition', so a view frozen with the
+other setting isn't used.
+"""
+import gzip
+import os
+import pickle
+import sys
+from array import array
+from bisect import bisect_left
+
+from . import util
+from .db_columnar import ColumnarMorphDb, isColumnar
+from .db_journal import journalPath, loadJournaled
+from .morphemes import altIncludesMorpheme
+from .preferences import get_preference as cfg
+
+
+class FrozenMorphDb:
+    def __init__(self, db=None):
+        # type: (MorphDb) -> None
+        self.keys = []  # sorted, interned group keys
+        self.starts = array('l', [0])  # variants of keys[i] are at starts[i]:starts[i + 1]
+        self.morphs = ()  # the variants
+        self.maturities = array('d')  # max maturity of each variant
+        self.frequencies = array('l')  # number of locations of each variant
+        self.ignore_grammar_position = cfg('Option_IgnoreGrammarPosition')  # of the group keys
+        if db is not None:
+            self._build(db.db)
+
+    def _build(self, morph_locs):
+        groups = {}
+        for m, locs in morph_locs.items():
+            mat = max((loc.maturity for loc in locs), default=0)
+            groups.setdefault(m.getGroupKey(), []).append((m, mat, len(locs)))
+
+        morphs = []
+        for gk in sorted(groups):
+            self.keys.append(sys.intern(gk))
+            for m, mat, freq in groups[gk]:
+                morphs.append(m)
+                self.maturities.append(mat)
+                self.frequencies.append(freq)
+            self.starts.append(len(morphs))
+        self.morphs = tuple(morphs)
+
+    def __len__(self):
+        return len(self.morphs)
+
+    def isCurrent(self):
+        """Whether the group keys were made with the current 'Option_IgnoreGrammarPosition'"""
+        return getattr(self, 'ignore_grammar_position', None) == cfg('Option_IgnoreGrammarPosition')
+
+    def _variants(self, m):
+        """Indexes of the variants that match 'm'"""
+        gk = m.getGroupKey()
+        i = bisect_left(self.keys, gk)
+        if i == len(self.keys) or self.keys[i] != gk:
+            return ()
+        return [j for j in range(self.starts[i], self.starts[i + 1]) if altIncludesMorpheme(self.morphs[j], m)]
+
+    def matches(self, m):
+        return len(self._variants(m)) > 0
+
+    def maxMaturity(self, m):
+        return max((self.maturities[j] for j in self._variants(m)), default=0)
+
+    def frequency(self, m):
+        """Like MorphDb.frequency(), but a location with several matching variants is counted for each of them"""
+        return sum(self.frequencies[j] for j in self._variants(m))
+
+    def save(self, path):
+        par = os.path.split(path)[0]
+        if not os.path.exists(par):
+            os.makedirs(par)
+        with gzip.open(path, 'wb') as f:
+            pickle.dump(self, f, -1)
+
+    @staticmethod
+    def load(path):
+        with gzip.open(path) as f:
+            return pickle.load(f)
+
+
+def maxMaturity(db, m):
+    """Max maturity of the locations of 'm' in a MorphDb, FrozenMorphDb or ColumnarMorphDb"""
+    if hasattr(db, 'maxMaturity'):
+        return db.maxMaturity(m)
+    locs = db.getMatchingLocs(m)
+    return max(loc.maturity for loc in locs) if locs else 0
+
+
+def freezeAllDb(allDb):
+    """Replaces the global all.db with its frozen view. The frozen view is saved along with the other dbs"""
+    frozen = FrozenMorphDb(allDb)
+    if cfg('saveDbs'):
+        frozen.save(cfg('path_all_frozen'))
+    util._allDb = frozen
+    return frozen
+
+
+def loadFrozenAllDb():
+    # type: () -> Optional[FrozenMorphDb]
+    """The frozen view saved by the last recalc, None if freezing is off or the view is missing or outdated"""
+    if not cfg('freeze all.db after recalc') or not os.path.exists(cfg('path_all_frozen')):
+        return None
+    frozen = FrozenMorphDb.load(cfg('path_all_frozen'))
+    return frozen if frozen.isCurrent() else None
+
+
+def allDbView():
+    """
+    all.db for queries: the frozen view of the last recalc if there is one, all.db with its journal replayed if it has
+    one, the mmap'ed view of a columnar all.db, or all.db itself
+    """
+    if isinstance(util._allDb, FrozenMorphDb) and not util._allDb.isCurrent():
+        util._allDb = None  # 'Option_IgnoreGrammarPosition' was changed since the recalc
+    if util._allDb is None:
+        util._allDb = loadFrozenAllDb()
+    if util._allDb is None:
+        if os.path.exists(journalPath(cfg('path_all'))):
+            # the base alone has the maturities of the recalc that last compacted the journal
+            util._allDb = loadJournaled(cfg('path_all'))
+        elif isColumnar(cfg('path_all')):
+            util._allDb = ColumnarMorphDb(cfg('path_all'))
+    return util.allDb()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Running parts of MorphMan in a plain Python process, outside of Anki's GUI.
+
+The add-on modules expect 'aqt.mw' to be a running main window, so before the add-on package is imported a small
+stand-in is installed that provides the few things MorphMan uses (the collection, the profile folder, progress).
+
+This file is imported by the add-on (to build the command line of a worker) and is also the script that the worker
+process runs, so it must not use relative imports.
+"""
+import importlib
+import json
+import os
+import sys
+import types
+
+
+class HeadlessProgress:
+    def start(self, *args, **kwargs):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+    def finish(self):
+        pass
+
+
+class HeadlessProfileManager:
+    def __init__(self, profile_folder):
+        self._profile_folder = profile_folder
+
+    def profileFolder(self):
+        return self._profile_folder
+
+
+class HeadlessAddonManager:
+    def __init__(self, addons_folder):
+        self._addons_folder = addons_folder
+
+    def addonsFolder(self, dir=None):
+        if dir is None:
+            return self._addons_folder
+        return os.path.join(self._addons_folder, dir)
+
+
+class HeadlessMainWindow:
+    """Stand-in for aqt.main.AnkiQt with just enough for MorphMan's non-GUI code."""
+
+    headless = True  # the add-on's asserts that mw is an AnkiQt accept this
+
+    def __init__(self, profile_folder, addons_folder, col=None):
+        self.col = col
+        self.pm = HeadlessProfileManager(profile_folder)
+        self.addonManager = HeadlessAddonManager(addons_folder)
+        self.progress = HeadlessProgress()
+
+    def reset(self):
+        pass
+
+    def checkpoint(self, name):
+        pass
+
+
+class NoPythonError(Exception):
+    """There is no Python interpreter to run a headless process with"""
+
+
+def pythonInterpreter():
+    # type: () -> str
+    """
+    'path_python', or the interpreter Anki runs on. Packaged Anki builds are frozen: their sys.executable is the Anki
+    binary, which would start another Anki instead of running a script
+    """
+    from .preferences import get_preference as cfg
+
+    python = cfg('path_python')
+    if python:
+        return python
+    if getattr(sys, 'frozen', False):
+        raise NoPythonError("This Anki build has no separate Python interpreter (%s is Anki itself). Set 'path_python' "
+                            "in MorphMan's config.py to a Python that can import anki and aqt to use separate "
+                            "processes." % sys.executable)
+    return sys.executable
+
+
+def workerCommand(entry, **kwargs):
+    # type: (str, ...) -> [str]
+    """
+    Returns the command line that runs 'entry' (a 'module.function' of this add-on) in a headless process.
+    Must be called from within Anki, 'kwargs' are passed to the function and have to be JSON serializable.
+    Raises NoPythonError if there is no interpreter for it.
+    """
+    from aqt import mw
+
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    bootstrap = {
+        'package': __name__.rsplit('.', 1)[0],
+        'addon_dir': addon_dir,
+        'addons_folder': os.path.dirname(addon_dir),
+        'profile_folder': mw.pm.profileFolder(),
+        'entry': entry,
+        'kwargs': kwargs,
+    }
+    return [pythonInterpreter(), os.path.abspath(__file__), json.dumps(bootstrap)]
+
+
+def preferencesSnapshot():
+    # type: () -> dict
+    """
+    The preferences of this process for installPreferences() in a headless one: every key of config.py, and the
+    preferences stored in the collection (MorphMan's Preferences dialog)
+    """
+    from . import config, preferences
+    from .preferences import get_preference as cfg
+
+    snapshot = {key: cfg(key) for key in config.default}
+    stored = getattr(preferences, 'config_data', None)
+    if isinstance(stored, dict):
+        snapshot.update(stored)
+    snapshot.update(_preferences)  # a headless process passes on its own snapshot
+    return snapshot
+
+
+_preferences = {}  # the snapshot of installPreferences()
+_get_preference = None  # the get_preference() it replaced
+
+
+def _snapshotPreference(key, *args, **kwargs):
+    try:
+        return _preferences[key]
+    except KeyError:
+        return _get_preference(key, *args, **kwargs)
+
+
+def installPreferences(snapshot):
+    # type: (dict) -> None
+    """
+    Makes get_preference() of this process answer from 'snapshot' (see preferencesSnapshot()), for headless processes
+    that have no collection to read the preferences from. The add-on modules bind get_preference when they are
+    imported, so this has to be called before they are; later calls only replace the snapshot.
+    """
+    global _get_preference
+    from . import preferences
+
+    if preferences.get_preference is not _snapshotPreference:
+        _get_preference = preferences.get_preference
+        preferences.get_preference = _snapshotPreference
+    _preferences.clear()
+    _preferences.update(snapshot)
+
+
+def loadAddonPackage(bootstrap, col=None):
+    """Installs the stand-in main window and registers the add-on package without running its __init__.py"""
+    import aqt
+
+    mw = HeadlessMainWindow(bootstrap['profile_folder'], bootstrap['addons_folder'], col)
+    aqt.mw = mw
+
+    package = bootstrap['package']
+    if package not in sys.modules:
+        module = types.ModuleType(package)
+        module.__path__ = [bootstrap['addon_dir']]
+        module.__file__ = os.path.join(bootstrap['addon_dir'], '__init__.py')
+        sys.modules[package] = module
+    return mw
+
+
+def main(argv):
+    bootstrap = json.loads(argv[1])
+    loadAddonPackage(bootstrap)
+    module_name, function_name = bootstrap['entry'].rsplit('.', 1)
+    module = importlib.import_module('%s.%s' % (bootstrap['package'], module_name))
+    getattr(module, function_name)(**bootstrap['kwargs'])
+
+
+if __name__ == '__main__':
+    # don't let the add-on folder shadow other modules when run as a script
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        del sys.path[0]
+    main(sys.argv)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Location types of all.db that are specific to this fork.
+"""
+from hashlib import blake2b
+
+from .morphemes import AnkiDeck
+
+
+def fieldHash(fieldValue):
+    # type: (str) -> bytes
+    return blake2b(fieldValue.encode('utf-8'), digest_size=8).digest()
+
+
+class HashedAnkiDeck(AnkiDeck):
+    """
+    An AnkiDeck location that keeps a fixed-size hash of the field instead of the field text. all.db only needs the
+    text to notice that a field was changed, and for long fields (IR3 articles) storing it means all.db holds a copy
+    of the whole collection. 'fieldValue' is always None.
+    """
+
+    def __init__(self, noteId, fieldName, fieldValue, guid, maturities, weight=1):
+        super(HashedAnkiDeck, self).__init__(noteId, fieldName, None, guid, maturities, weight)
+        self.fieldHash = fieldHash(fieldValue)
+
+    @staticmethod
+    def fromAnkiDeck(loc):
+        # type: (AnkiDeck) -> HashedAnkiDeck
+        return HashedAnkiDeck(loc.noteId, loc.fieldName, loc.fieldValue, loc.guid, loc.maturities, loc.weight)
+
+    @staticmethod
+    def withHash(noteId, fieldName, hash, guid, maturities, weight=1):
+        # type: (int, str, bytes, str, [float], float) -> HashedAnkiDeck
+        loc = HashedAnkiDeck.__new__(HashedAnkiDeck)
+        AnkiDeck.__init__(loc, noteId, fieldName, None, guid, maturities, weight)
+        loc.fieldHash = hash
+        return loc
+
+
+def setMaturities(loc, maturities):
+    # type: (AnkiDeck, [float]) -> None
+    """
+    Updates the maturities of a location in place. Locations hash by identity, so the location stays valid as a key of
+    locDb and of the location sets of MorphDb.db; nothing has to be rehashed or reallocated.
+    """
+    loc.maturities = maturities
+    loc.maturity = max(maturities) if maturities else 0
+
+
+def fieldValueMatches(loc, fieldValue):
+    # type: (AnkiDeck, str) -> bool
+    """Whether the field of an AnkiDeck or HashedAnkiDeck location still has the value 'fieldValue'"""
+    try:
+        return loc.fieldHash == fieldHash(fieldValue)
+    except AttributeError:
+        return loc.fieldValue == fieldValue
+
+
+def hashLocations(db):
+    # type: (MorphDb) -> int
+    """
+    Migrates a MorphDb in place: every AnkiDeck location that stores the field text is replaced by a HashedAnkiDeck.
+    Returns the number of migrated locations.
+    """
+    hashed = {}
+    for m, locs in db.db.items():
+        if not any(type(loc) is AnkiDeck for loc in locs):
+            continue
+        new_locs = set()
+        for loc in locs:
+            if type(loc) is AnkiDeck:
+                if loc not in hashed:
+                    hashed[loc] = HashedAnkiDeck.fromAnkiDeck(loc)
+                loc = hashed[loc]
+            new_locs.add(loc)
+        db.db[m] = new_locs
+    return len(hashed)
@@ -16,8 +16,11 @@ from anki.utils import splitFields, joinFields, stripHTML, intTime, fieldChecksu
 from .morphemes import Location, Morpheme
 from . import stats
 from . import util
-from .morphemes import MorphDb, AnkiDeck, getMorphemes
-from .morphemizer import getMorphemizerByName
+from .morphemes import MorphDb, AnkiDeck
+from .locations import HashedAnkiDeck, fieldValueMatches, hashLocations, setMaturities
+from .db_journal import AllDbDelta, loadJournaled, saveJournaled
+from .overlay_db import overlayDbs
+from .morphemizer import getMorphemeCache, getMorphemesBatch, getMorphemizerByName
 from .util import printf, mw, errorMsg, getFilter, getFilterByMidAndTags
 from .preferences import get_preference as cfg
 from .util_external import memoize
@@ -33,8 +36,8 @@ try:
 except ImportError:
     pass
 
-# only for jedi-auto-completion
-assert isinstance(mw, aqt.main.AnkiQt)
+# only for jedi-auto-completion. headless processes (see headless.py) have a stand-in main window
+assert getattr(mw, 'headless', False) or isinstance(mw, aqt.main.AnkiQt)
 
 
 @memoize
@@ -96,11 +99,40 @@ def mkAllDb(all_db=None):
     mw.progress.start(label='Prep work for all.db creation',
                       max=N_notes, immediate=True)
 
+    # changes to the loaded all.db, for the journal. None -> save a new base
+    delta = AllDbDelta() if all_db else None
     if not all_db:
         all_db = MorphDb()
+    if cfg('hash field values in all.db'):
+        Loc = HashedAnkiDeck
+        n_hashed = hashLocations(all_db)
+        if n_hashed:
+            printf('Replaced the field text of %d all.db locations by its hash' % n_hashed)
+            delta = None
+    else:
+        Loc = AnkiDeck
     fidDb = all_db.fidDb()
     locDb = all_db.locDb(recalc=False)  # fidDb() already forces locDb recalc
 
+    # new and changed fields wait here to be morphemized in batches:
+    # morphemizer -> [(new loc, replaced loc or None, fieldValue, note tags)]
+    pending = {}
+
+    def morphemizePending(morphemizer):
+        batch = pending.pop(morphemizer, [])
+        morphs = getMorphemesBatch(morphemizer, [b[2] for b in batch], [b[3] for b in batch])
+        for (loc, oldLoc, _, _), ms in zip(batch, morphs):
+            if oldLoc is None:
+                if ms:  # TODO: this needed? should we change below too then?
+                    locDb[loc] = ms
+                    if delta is not None:
+                        delta.locationChanged(loc, ms)
+            else:
+                locDb.pop(oldLoc)
+                locDb[loc] = ms
+                if delta is not None:
+                    delta.locationChanged(loc, ms)
+
     mw.progress.update(label='Generating all.db data')
     for i, (nid, mid, flds, guid, tags) in enumerate(db.execute('select id, mid, flds, guid, tags from notes')):
         if i % 500 == 0:
@@ -138,23 +170,25 @@ def mkAllDb(all_db=None):
 
             loc = fidDb.get((nid, guid, fieldName), None)
             if not loc:
-                loc = AnkiDeck(nid, fieldName, fieldValue, guid, mats)
-                ms = getMorphemes(morphemizer, fieldValue, ts)
-                if ms:  # TODO: this needed? should we change below too then?
-                    locDb[loc] = ms
+                loc = Loc(nid, fieldName, fieldValue, guid, mats)
+                pending.setdefault(morphemizer, []).append((loc, None, fieldValue, ts))
             else:
-                # mats changed -> new loc (new mats), move morphs
-                if loc.fieldValue == fieldValue and loc.maturities != mats:
-                    newLoc = AnkiDeck(nid, fieldName, fieldValue, guid, mats)
-                    locDb[newLoc] = locDb.pop(loc)
+                field_unchanged = fieldValueMatches(loc, fieldValue)
+                # mats changed -> same loc, same morphs, new mats
+                if field_unchanged and loc.maturities != mats:
+                    setMaturities(loc, mats)
+                    if delta is not None:
+                        delta.maturitiesChanged(loc)
                 # field changed -> new loc, new morphs
-                elif loc.fieldValue != fieldValue:
-                    newLoc = AnkiDeck(nid, fieldName, fieldValue, guid, mats)
-                    ms = getMorphemes(morphemizer, fieldValue, ts)
-                    locDb.pop(loc)
-                    locDb[newLoc] = ms
+                elif not field_unchanged:
+                    newLoc = Loc(nid, fieldName, fieldValue, guid, mats)
+                    pending.setdefault(morphemizer, []).append((newLoc, loc, fieldValue, ts))
+        if len(pending.get(morphemizer, ())) >= cfg('morphemizer batch size'):
+            morphemizePending(morphemizer)
         if i % 100 == 0:
             mw.progress.update(value=i, label='Creating all.db objects')
+    for morphemizer in list(pending):
+        morphemizePending(morphemizer)
 
     if N_enabled_notes == 0:
         mw.progress.finish()
@@ -163,12 +197,14 @@ def mkAllDb(all_db=None):
         return None
 
     printf('Processed all %d notes in %f sec' % (N_notes, time.time() - t_0))
+    if getMorphemeCache() is not None:
+        printf(getMorphemeCache().stats())
 
     all_db.clear()
     all_db.addFromLocDb(locDb)
     if cfg('saveDbs'):
         mw.progress.update(label='Saving all.db to disk')
-        all_db.save(cfg('path_all'))
+        saveJournaled(all_db, cfg('path_all'), delta if cfg('journal all.db') else None)
         printf('Processed all %d notes + saved all.db in %f sec' %
                (N_notes, time.time() - t_0))
     mw.progress.finish()
@@ -184,7 +220,15 @@ def filterDbByMat(db, mat):
     return newDb
 
 
-def updateNotes(allDb):
+def applyUpdates(note_ds, card_ds):
+    """Writes the note and new card updates computed by updateNotes() to the collection"""
+    mw.col.db.executemany(
+        'update notes set tags=:tags, flds=:flds, sfld=:sfld, csum=:csum, mod=:now, usn=:usn where id=:nid', note_ds)
+    mw.col.db.executemany(
+        'update cards set due=:due, mod=:now, usn=:usn where id=:cid', card_ds)
+
+
+def updateNotes(allDb, apply_updates=applyUpdates):
     t_0, now, db = time.time(), intTime(), mw.col.db
 
     TAG = mw.col.tags  # type: TagManager
@@ -652,9 +696,7 @@ def updateNotes(allDb):
             ds.append(
                 {'now': now, 'tags': tags_, 'flds': flds_, 'sfld': sfld, 'csum': csum, 'usn': mw.col.usn(), 'nid': nid})
 
-    mw.progress.update(label='Updating anki database...')
-    mw.col.db.executemany(
-        'update notes set tags=:tags, flds=:flds, sfld=:sfld, csum=:csum, mod=:now, usn=:usn where id=:nid', ds)
+    note_ds = ds
 
     # Now reorder new cards based on MMI
     mw.progress.update(label='Updating new card ordering...')
@@ -671,8 +713,8 @@ def updateNotes(allDb):
                 ds.append({'now': now, 'due': due_,
                            'usn': mw.col.usn(), 'cid': cid})
 
-    mw.col.db.executemany(
-        'update cards set due=:due, mod=:now, usn=:usn where id=:cid', ds)
+    mw.progress.update(label='Updating anki database...')
+    apply_updates(note_ds, ds)
     mw.reset()
 
     printf('Updated notes in %f sec' % (time.time() - t_0))
@@ -680,11 +722,16 @@ def updateNotes(allDb):
     return knownDb
 
 
-def main():
+def recalc(apply_updates=applyUpdates):
+    """
+    Rebuilds all.db and updates the notes, with external.db laid over all.db. Returns (allDb, knownDb) or None on error
+    """
     # load existing all.db
     mw.progress.start(label='Loading existing all.db', immediate=True)
     t_0 = time.time()
-    cur = util.allDb(reload=True) if cfg('loadAllDb') else None
+    # drop the query view of all.db, a mmap'ed columnar all.db can't be replaced on Windows while it is open
+    util._allDb = None
+    cur = loadJournaled(cfg('path_all')) if cfg('loadAllDb') else None
     printf('Loaded all.db in %f sec' % (time.time() - t_0))
     mw.progress.finish()
 
@@ -693,20 +740,36 @@ def main():
     # there was an (non-critical-/non-"exception"-)error but error message was already displayed
     if not allDb:
         mw.progress.finish()
-        return
+        return None
 
-    # merge in external.db
-    mw.progress.start(label='Merging ext.db', immediate=True)
-    ext = MorphDb(cfg('path_ext'), ignoreErrors=True)
-    allDb.merge(ext)
+    # put external.db and the extra dbs on top of all.db
+    mw.progress.start(label='Loading ext.db', immediate=True)
+    allDb = overlayDbs(allDb, [cfg('path_ext')] + cfg('paths_overlay'))
     mw.progress.finish()
 
     # update notes
-    knownDb = updateNotes(allDb)
+    knownDb = updateNotes(allDb, apply_updates)
+    return allDb, knownDb
+
+
+def main():
+    if cfg('recalc in separate process'):
+        from .recalc_process import recalcOutOfProcess
+        recalcOutOfProcess()
+        return
+
+    result = recalc()
+    if result is None:
+        return
+    allDb, knownDb = result
 
     # update stats and refresh display
     stats.updateStats(knownDb)
     mw.toolbar.draw()
 
     # set global allDb
-    util._allDb = allDb
+    if cfg('freeze all.db after recalc'):
+        from .frozen_db import freezeAllDb
+        freezeAllDb(allDb)
+    else:
+        util._allDb = allDb.merged()
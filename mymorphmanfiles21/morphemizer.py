@@ -1,44 +1,22 @@
 #!/usr/bin/python3
+import os
 import re
 
-from typing import Dict, Iterator, List, Optional, Set
+from bisect import bisect_right
 
-from .morphemes import Morpheme
-from .deps.zhon.hanzi import characters
-from .mecab_wrapper import getMorphemesMecab
-from .deps.jieba import posseg
-
-#from .aleksej_morphemizer_code import getMorphemesFromExpr_Aleksej_general
-#from .aleksej_morphemizer_data import *
-
-from .aleksej_morphemizer_data import BAD_BASE_FORMS_EVEN_FOR_PAIRS_DE, \
-                                      BAD_BASE_FORMS_CASE_INSENS_DE, BAD_BASE_FORMS_CASE_SENS_DE
-from .aleksej_morphemizer_data import ENDING_DICT_DE, ENDING_DICT_CUR_SET_DE, \
-                                      FULLWORD_DICT_DE, TRANSLATION_TABLE_DE
-
-from .aleksej_morphemizer_data import BAD_BASE_FORMS_EVEN_FOR_PAIRS_EN, \
-                                      BAD_BASE_FORMS_CASE_INSENS_EN, BAD_BASE_FORMS_CASE_SENS_EN
-from .aleksej_morphemizer_data import ENDING_DICT_EN, ENDING_DICT_CUR_SET_EN, \
-                                      FULLWORD_DICT_EN, TRANSLATION_TABLE_EN
-
-from .aleksej_morphemizer_data import BAD_BASE_FORMS_EVEN_FOR_PAIRS_EO, \
-                                      BAD_BASE_FORMS_CASE_INSENS_EO, BAD_BASE_FORMS_CASE_SENS_EO
-from .aleksej_morphemizer_data import ENDING_DICT_EO, ENDING_DICT_CUR_SET_EO, \
-                                      FULLWORD_DICT_EO, TRANSLATION_TABLE_EO
-
-from .aleksej_morphemizer_data import BAD_BASE_FORMS_EVEN_FOR_PAIRS_ES, BAD_BASE_FORMS_CASE_INSENS_ES, BAD_BASE_FORMS_CASE_SENS_ES
-from .aleksej_morphemizer_data import ENDING_DICT_ES, ENDING_DICT_CUR_SET_ES, FULLWORD_DICT_ES, TRANSLATION_TABLE_ES
-
-from .aleksej_morphemizer_data import BAD_BASE_FORMS_EVEN_FOR_PAIRS_RU, BAD_BASE_FORMS_CASE_INSENS_RU, BAD_BASE_FORMS_CASE_SENS_RU
-from .aleksej_morphemizer_data import ENDING_DICT_RU, ENDING_DICT_CUR_SET_RU, FULLWORD_DICT_RU, TRANSLATION_TABLE_RU
-
-from .aleksej_morphemizer_data import BAD_BASE_FORMS_EVEN_FOR_PAIRS_TOTAL, BAD_BASE_FORMS_CASE_INSENS_TOTAL, BAD_BASE_FORMS_CASE_SENS_TOTAL
-from .aleksej_morphemizer_data import ENDING_DICT_TOTAL, ENDING_DICT_CUR_SET_TOTAL, FULLWORD_DICT_TOTAL, TRANSLATION_TABLE_TOTAL
+from collections import OrderedDict
+from typing import Dict, List, Set
 
-from .aleksej_morphemizer_data import CLOZE_MARKS, PAIRS_WORDSEPARATOR
-from .aleksej_morphemizer_extra import morphemizer_extra_processing
+from .aleksej_data_cache import loadAleksejTables
+from .morphemes import Morpheme
+from .preferences import get_preference as cfg
+from .util import printf
+from .worker_pool import WorkerError, getWorkerPool, splitChunks, workersAvailable
+# mecab_wrapper, jieba, zhon and the Aleksej tables are imported when the morphemizer that needs them is first used
 
 PRIMARY_PUNCTUATION_REGEXP=r"\b[^\s{}«»\"]+"
+PRIMARY_PUNCTUATION_REGEX = re.compile(PRIMARY_PUNCTUATION_REGEXP, re.UNICODE)
+URL_PREFIXES = ("http://", "https://")
 SECONDARY_PUNCTUATION_STRING = ".,;:!?()+-*×/—− "
 
 ####################################################################################################
@@ -46,6 +24,18 @@ SECONDARY_PUNCTUATION_STRING = ".,;:!?()+-*×/—− "
 ####################################################################################################
 
 class Morphemizer:
+    # the preferences of a morphemizer in a worker process, which has no collection to read them from (see
+    # workerMorphemizer()). None in Anki's process, where option() reads them with cfg()
+    options = None  # type: Optional[Dict[str, Any]]
+
+    def option(self, key):
+        return cfg(key) if self.options is None else self.options[key]
+
+    def workerOptions(self):
+        # type: () -> Dict[str, Any]
+        """The preferences this morphemizer reads with option(), sent along to worker processes"""
+        return {}
+
     def getMorphemesFromExpr(self, expression):
         # type: (str) -> List[Morpheme]
         """
@@ -53,6 +43,14 @@ class Morphemizer:
         """
         return []
 
+    def getMorphemesFromExprs(self, expressions):
+        # type: (List[str]) -> List[List[Morpheme]]
+        """
+        getMorphemesFromExpr() for several expressions. Morphemizers that talk to another process override this to
+        send the whole batch at once.
+        """
+        return [self.getMorphemesFromExpr(e) for e in expressions]
+
     def getDescription(self):
         # type: () -> str
         """
@@ -69,25 +67,256 @@ class Morphemizer:
 # Morphemizer Helpers
 ####################################################################################################
 
+def getMorphemizerClasses():
+    # type: () -> List[type]
+    AleksejMorphemizers: List[type] = [
+        SpaceMorphemizerAleksej,
+        SpaceMorphemizerAleksejDe,
+        SpaceMorphemizerAleksejEn,
+        SpaceMorphemizerAleksejEo,
+        SpaceMorphemizerAleksejEs,
+        SpaceMorphemizerAleksejRu,
+        ]
+    return [SpaceMorphemizer, MecabMorphemizer, JiebaMorphemizer, CjkCharMorphemizer] + AleksejMorphemizers + \
+           [ScriptDispatchMorphemizer]
+
+
+# Registry: name -> class, and name -> the one instance of each morphemizer, constructed on first use
+_morphemizer_classes: Dict[str, type] = {}
+_morphemizers: Dict[str, Morphemizer] = {}
+
+
 def getAllMorphemizers():
     # type: () -> List[Morphemizer]
-    AleksejMorphemizers: List[Morphemizer] = [
-        SpaceMorphemizerAleksej(),
-        SpaceMorphemizerAleksejDe(),
-        SpaceMorphemizerAleksejEn(),
-        SpaceMorphemizerAleksejEo(),
-        SpaceMorphemizerAleksejEs(),
-        SpaceMorphemizerAleksejRu(),
-        ]
-    return [SpaceMorphemizer(), MecabMorphemizer(), JiebaMorphemizer(), CjkCharMorphemizer()] + AleksejMorphemizers
+    return [getMorphemizerByName(cls.__name__) for cls in getMorphemizerClasses()]
+
+
+def getMorphemizerClass(name):
+    # type: (str) -> Optional[type]
+    if not _morphemizer_classes:
+        _morphemizer_classes.update((cls.__name__, cls) for cls in getMorphemizerClasses())
+    return _morphemizer_classes.get(name, None)
 
 
 def getMorphemizerByName(name):
     # type: (str) -> Optional[Morphemizer]
-    for m in getAllMorphemizers():
-        if m.getName() == name:
-            return m
-    return None
+    try:
+        return _morphemizers[name]
+    except KeyError:
+        pass
+    cls = getMorphemizerClass(name)
+    if cls is None:
+        return None
+    m = cls()
+    if cfg('morpheme cache size') > 0:
+        m = CachingMorphemizer(m, getMorphemeCache())
+    _morphemizers[name] = m
+    return m
+
+
+class MorphemeCache:
+    """
+    LRU of the morphs of expressions, keyed by (morphemizer name, expression). Subtitle lines like "Yes." occur
+    thousands of times. The morphs are kept as tuples, so no caller can change a cached entry.
+    """
+
+    def __init__(self, max_entries, max_expression_length):
+        self.entries = OrderedDict()  # type: OrderedDict[Tuple[str, str], Tuple[Morpheme, ...]]
+        self.max_entries = max_entries
+        self.max_expression_length = max_expression_length  # longer ones (whole articles) aren't cached
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        ms = self.entries.get(key, None)
+        if ms is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return ms
+
+    def put(self, key, ms):
+        if len(key[1]) > self.max_expression_length:
+            return
+        self.entries[key] = tuple(ms)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        # type: () -> str
+        lookups = self.hits + self.misses
+        return 'Morpheme cache: %d entries, %d hits, %d misses (%.1f%% hit rate)' % (
+            len(self.entries), self.hits, self.misses, 100.0 * self.hits / lookups if lookups else 0)
+
+
+_morpheme_cache = None
+
+
+def getMorphemeCache():
+    # type: () -> Optional[MorphemeCache]
+    """The cache shared by all morphemizers, None if 'morpheme cache size' is 0"""
+    global _morpheme_cache
+    if _morpheme_cache is None and cfg('morpheme cache size') > 0:
+        _morpheme_cache = MorphemeCache(cfg('morpheme cache size'), cfg('morpheme cache max expression length'))
+    return _morpheme_cache
+
+
+class CachingMorphemizer(Morphemizer):
+    """A morphemizer that looks up expressions in a MorphemeCache first. Returns lists, copies of the cached tuples"""
+
+    def __init__(self, morphemizer, cache):
+        # type: (Morphemizer, MorphemeCache) -> None
+        self.morphemizer = morphemizer
+        self.cache = cache
+
+    def __getattr__(self, name):
+        if name == 'morphemizer':  # not set yet
+            raise AttributeError(name)
+        return getattr(self.morphemizer, name)
+
+    def getName(self):
+        return self.morphemizer.getName()
+
+    def getDescription(self):
+        return self.morphemizer.getDescription()
+
+    def workerOptions(self):
+        return self.morphemizer.workerOptions()
+
+    def getMorphemesFromExpr(self, expression):
+        key = (self.morphemizer.getName(), expression)
+        ms = self.cache.get(key)
+        if ms is None:
+            ms = self.morphemizer.getMorphemesFromExpr(expression)
+            self.cache.put(key, ms)
+        return list(ms)
+
+    def getMorphemesFromExprs(self, expressions):
+        # each expression is looked up and parsed once, however often it is in the batch
+        name = self.morphemizer.getName()
+        found = {e: self.cache.get((name, e)) for e in dict.fromkeys(expressions)}
+        missing = [e for e, ms in found.items() if ms is None]
+        if missing:
+            for e, ms in zip(missing, self.morphemizer.getMorphemesFromExprs(missing)):
+                self.cache.put((name, e), ms)
+                found[e] = ms
+        return [list(found[e]) for e in expressions]
+
+
+# fewest expressions to send to a worker process
+MIN_WORKER_CHUNK = 25
+
+
+# the morphemizers of a worker process, without a MorphemeCache: the parent process caches what the workers parse
+_worker_morphemizers: Dict[str, Morphemizer] = {}
+
+
+def workerMorphemizer(name, options):
+    # type: (str, Dict[str, Any]) -> Morphemizer
+    """
+    The morphemizer 'name' for a worker process. Workers have no collection, so instead of reading the preferences
+    with cfg() it uses 'options', the workerOptions() of the morphemizer in Anki's process
+    """
+    m = _worker_morphemizers.get(name, None)
+    if m is None:
+        m = _worker_morphemizers[name] = getMorphemizerClass(name)()
+    m.options = options
+    return m
+
+
+def parseBatchInWorker(name, expressions, options):
+    # type: (str, List[str], Dict[str, Any]) -> List[List[Morpheme]]
+    """Entry of the morphemizer worker processes"""
+    return workerMorphemizer(name, options).parseBatch(expressions)
+
+
+def parseBatchInWorkers(morphemizer, expressions, n_processes):
+    # type: (Morphemizer, List[str], int) -> List[List[Morpheme]]
+    """
+    morphemizer.parseBatch() for 'expressions', split over up to 'n_processes' worker processes if the batch is large
+    enough. Parses in this process if there is only one or the workers fail. In a worker process (one of the
+    readability workers) 'morphemizer' has its options and parses the batch itself.
+    """
+    name = morphemizer.getName()
+    if morphemizer.options is None and n_processes > 1 and len(expressions) >= 2 * MIN_WORKER_CHUNK \
+            and workersAvailable():
+        chunks = splitChunks(expressions, min(n_processes, len(expressions) // MIN_WORKER_CHUNK))
+        options = morphemizer.workerOptions()
+        try:
+            results = getWorkerPool(name, n_processes).map('morphemizer.parseBatchInWorker',
+                                                           [(name, chunk, options) for chunk in chunks])
+        except (WorkerError, EOFError, OSError) as e:
+            printf('%s worker processes failed, parsing in this process: %s' % (name, e))
+        else:
+            return [ms for result in results for ms in result]
+    return morphemizer.parseBatch(expressions)
+
+
+class RecordingMorphemizer(Morphemizer):
+    """
+    Stands in for a morphemizer in morphemes.getMorphemes() to record the expressions it would be given (after the
+    bracket and replace rules, which may split an expression and parse each part). Each call returns a placeholder
+    morph of its own that getMorphemesBatch() replaces.
+    """
+
+    def __init__(self, morphemizer):
+        self.morphemizer = morphemizer
+        self.expressions = []
+        self.placeholders = []
+
+    def getMorphemesFromExpr(self, expression):
+        placeholder = Morpheme('', '', '', '', 'BATCH', 'BATCH')
+        self.expressions.append(expression)
+        self.placeholders.append(placeholder)
+        return [placeholder]
+
+    def getName(self):
+        return self.morphemizer.getName()
+
+
+def getMorphemesBatch(morphemizer, expressions, tags=None):
+    # type: (Morphemizer, List[str], Optional[List[List[str]]]) -> List[List[Morpheme]]
+    """morphemes.getMorphemes() for several expressions, with one getMorphemesFromExprs() call for all of them"""
+    from .morphemes import getMorphemes
+    if tags is None:
+        tags = [None] * len(expressions)
+    if type(morphemizer).getMorphemesFromExprs is Morphemizer.getMorphemesFromExprs:
+        return [getMorphemes(morphemizer, e, t) for e, t in zip(expressions, tags)]
+
+    # getMorphemes() with the placeholders, and the placeholders and expressions of its calls to the morphemizer
+    recorded = []  # type: List[Tuple[List[Morpheme], List[Morpheme], List[str]]]
+    for e, t in zip(expressions, tags):
+        recorder = RecordingMorphemizer(morphemizer)
+        recorded.append((getMorphemes(recorder, e, t), recorder.placeholders, recorder.expressions))
+    batch = iter(morphemizer.getMorphemesFromExprs([expr for _, _, exprs in recorded for expr in exprs]))
+
+    result = []
+    for (e, t), (ms, placeholders, exprs) in zip(zip(expressions, tags), recorded):
+        batch_ms = {id(p): next(batch) for p in placeholders}
+        replaced = []
+        n_replaced = 0
+        for m in ms:
+            parsed = batch_ms.get(id(m), None)
+            if parsed is None:
+                replaced.append(m)
+            else:
+                replaced.extend(parsed)
+                n_replaced += 1
+        if n_replaced != len(placeholders):  # getMorphemes() did something else with the morphs, run it for real
+            replaced = getMorphemes(morphemizer, e, t)
+        result.append(replaced)
+    return result
+
+
+def joinedStarts(expressions):
+    # type: (List[str]) -> List[int]
+    """Start offsets of 'expressions' in '\\n'.join(expressions), to attribute matches in the joined text"""
+    starts, offset = [], 0
+    for e in expressions:
+        starts.append(offset)
+        offset += len(e) + 1
+    return starts
 
 
 ####################################################################################################
@@ -95,6 +324,8 @@ def getMorphemizerByName(name):
 ####################################################################################################
 
 space_char_regex = re.compile(' ')
+# put on a line of its own between the expressions of a batch. mecab makes it one unknown-word node
+MECAB_BATCH_SEPARATOR = 'MORPHMANBATCHSEPARATOR'
 
 class MecabMorphemizer(Morphemizer):
     """
@@ -107,8 +338,44 @@ class MecabMorphemizer(Morphemizer):
         if space_char_regex.search(expression):
             expression = space_char_regex.sub('', expression)
 
+        from .mecab_wrapper import getMorphemesMecab
         return getMorphemesMecab(expression)
 
+    def getMorphemesFromExprs(self, expressions):
+        # each worker process has its own mecab
+        return parseBatchInWorkers(self, expressions, self.option('mecab processes'))
+
+    def workerOptions(self):
+        return {'mecab processes': 1}  # a worker parses its batches itself
+
+    def parseBatch(self, expressions):
+        # type: (List[str]) -> List[List[Morpheme]]
+        """One round-trip to the mecab process for the whole batch, split at the separator nodes"""
+        exprs = [space_char_regex.sub('', e) for e in expressions]
+        if len(exprs) < 2 or any(MECAB_BATCH_SEPARATOR in e for e in exprs):
+            return [self.getMorphemesFromExpr(e) for e in expressions]
+
+        from .mecab_wrapper import getMorphemesMecab
+        batches = [[]]
+        for m in getMorphemesMecab(('\n%s\n' % MECAB_BATCH_SEPARATOR).join(exprs)):
+            if MECAB_BATCH_SEPARATOR in (m.inflected, m.base):
+                batches.append([])
+            else:
+                batches[-1].append(m)
+        if len(batches) != len(exprs):  # mecab didn't keep the separator whole
+            self.batchFallback(len(exprs), len(batches))
+            return [self.getMorphemesFromExpr(e) for e in expressions]
+        return batches
+
+    # batches that parseBatch() parsed one expression at a time, in this process. morphemizer_bench.py reports it
+    batch_fallbacks = 0
+
+    def batchFallback(self, n_expressions, n_parts):
+        if MecabMorphemizer.batch_fallbacks == 0:
+            printf('mecab split a batch of %d expressions into %d parts at %s, parsing one expression at a time. Is '
+                   'its node dropped by MECAB_POS_BLACKLIST?' % (n_expressions, n_parts, MECAB_BATCH_SEPARATOR))
+        MecabMorphemizer.batch_fallbacks += 1
+
     def getDescription(self):
         return 'Japanese'
 
@@ -118,6 +385,9 @@ class MecabMorphemizer(Morphemizer):
 ####################################################################################################
 
 
+SPACE_WORD_REGEX = re.compile(r"\b[^\s\d()]+\b", re.UNICODE)
+
+
 class SpaceMorphemizer(Morphemizer):
     """
     Morphemizer for languages that use spaces (English, German, Spanish, ...). Because it is
@@ -127,10 +397,19 @@ class SpaceMorphemizer(Morphemizer):
     def getMorphemesFromExpr(self, e):
         str_lower = str.lower
         word_list = [
-            str_lower(word) for word in re.findall(r"\b[^\s\d()]+\b", e, re.UNICODE)
+            str_lower(word) for word in SPACE_WORD_REGEX.findall(e)
             ]
         return [Morpheme(word, word, word, word, 'UNKNOWN', 'UNKNOWN') for word in word_list]
 
+    def getMorphemesFromExprs(self, expressions):
+        # one regex pass over the joined expressions. '\n' is whitespace, so no word spans two expressions
+        starts = joinedStarts(expressions)
+        result = [[] for _ in expressions]
+        for match in SPACE_WORD_REGEX.finditer('\n'.join(expressions)):
+            word = match.group().lower()
+            result[bisect_right(starts, match.start()) - 1].append(Morpheme(word, word, word, word, 'UNKNOWN', 'UNKNOWN'))
+        return result
+
     def getDescription(self):
         return 'Language w/ Spaces'
 
@@ -141,6 +420,101 @@ class SpaceMorphemizer(Morphemizer):
 
 
 
+# normalization of SpaceMorphemizerAleksej_parent.getMorphemesFromExpr(), compiled once
+ALEKSEJ_TRANSLATION = str.maketrans("ſ:{}", "s   ")
+# the opening of a cloze. The "::" before a hint and the closing "}}" become spaces with ALEKSEJ_TRANSLATION
+CLOZE_START_REGEX = re.compile("\\{\\{c\\d+::")
+MONTH_NAME_DATE_REGEX = re.compile(
+    "(?P<month>jan(uary)?|feb(ruary)?|mar(ch)?|june?|july?|aug(ust)?|sep(t(ember)?)?|oct(ober?)|nov(ember)?|dec(ember)?)"
+    "\\.? (?P<date>\\d{1,2})(st|nd|rd|th)?, (?P<year>\\d{4})")
+# matches wherever one of ISO_MONTH_REGEXES can match. Those have to run one after another (each consumes the
+# character before the year), but they only run if there is such a date at all
+ISO_DATE_REGEX = re.compile("1\\d\\d\\d-(0[1-9]|1[0-2])-")
+ISO_MONTH_REGEXES = [
+    (re.compile("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-%02d-(?P<date>)" % number),
+     "\\g<prechar>\\g<date> %s \\g<year>" % month)
+    for number, month in enumerate(['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+                                    'september', 'october', 'november', 'december'], 1)
+]
+# (text, regex or None for a plain replace, replacement), applied in this order. The order matters: the rules overlap
+# ("of the" / "the", "on the" / "the a") and '_' changes the word boundaries the later rules see
+WORD_JOIN_RULES = [
+    (" of the ", None, "_of the_"),
+    (" of a ",   None, "_of a_"),
+    (" of an ",  None, "_of an_"),
+    (" on the ", None, "_on the_"),
+    (" on a ",   None, "_on a_"),
+    (" on an ",  None, "_on an_"),
+    ("in the ",  re.compile("\\bin the "), "in_the_"),
+    ("in a ",    re.compile("\\bin a "),   "in_a_"),
+    ("in an ",   re.compile("\\bin an "),  "in_an_"),
+    ("at the ",  re.compile("\\bat the "), "at_the_"),
+    ("at a ",    re.compile("\\bat a "),   "at_a_"),
+    ("at an ",   re.compile("\\bat an "),  "at_an_"),
+    (" with the ", None, "_with the_"),
+    (" with a ",   None, "_with a_"),
+    (" with an ",  None, "_with an_"),
+    (" off the ", None, "_off the_"),
+    (" off a ",   None, "_off a_"),
+    (" off an ",  None, "_off an_"),
+    ("to the ",  re.compile("\\bto the "), "to_the_"),
+    ("to a ",    re.compile("\\bto a "),   "to_a_"),
+    ("to an ",   re.compile("\\bto an "),  "to_an_"),
+    (" from the ", None, "_from the_"),
+    (" from a ",   None, "_from a_"),
+    (" from an ",  None, "_from an_"),
+    ("the ",     re.compile("\\bthe "), "the_"),
+    ("a ",       re.compile("\\ba "),   "a_"),
+    ("an ",      re.compile("\\ban "),  "an_"),
+    ("you can",  re.compile("\\byou can\\b"), "you_can"),
+    ("i have",   re.compile("\\bi have\\b"),  "i_have"),
+    ("be ",      re.compile("\\bbe "),   "be_"),
+    ("you all",  re.compile("\\byou all\\b"), "you_all"),
+]
+
+
+class EndingTable:
+    """
+    The ending rules of a language, as hash tables by ending length. Looking up the ending of a word takes one dict
+    lookup per ending length, instead of an endswith() per ending.
+    """
+
+    def __init__(self, ending_dict, ending_dict_cur_set):
+        # type: (Dict[str, str], Iterable[str]) -> None
+        # ending -> [priority (position in ending_dict_cur_set) or None, replaced (in ending_dict)]
+        entries = {ending: [None, ending in ending_dict] for ending in ending_dict}
+        for priority, ending in enumerate(ending_dict_cur_set):
+            entries.setdefault(ending, [None, ending in ending_dict])
+            if entries[ending][0] is None:
+                entries[ending][0] = priority
+        by_length = {}
+        for ending, entry in entries.items():
+            by_length.setdefault(len(ending), {})[ending] = tuple(entry)
+        self.by_length = sorted(by_length.items())
+        self.ending_dict = ending_dict
+
+    def baseForm(self, word):
+        # type: (str) -> str
+        """
+        Applies the ending of ending_dict_cur_set that comes first there, if the word has an ending of ending_dict at
+        all. Otherwise returns the word.
+        """
+        n_word, replaced, best, best_priority = len(word), False, None, None
+        for n, endings in self.by_length:
+            if n > n_word:
+                break
+            entry = endings.get(word[n_word - n:], None)
+            if entry is None:
+                continue
+            priority, in_ending_dict = entry
+            replaced = replaced or in_ending_dict
+            if priority is not None and (best_priority is None or priority < best_priority):
+                best, best_priority = word[n_word - n:], priority
+        if not replaced or best is None:
+            return word
+        return ''.join([word[: -len(best)], self.ending_dict[best]])
+
+
 class SpaceMorphemizerAleksej_parent(Morphemizer):
     """
     Morphemizer for languages that use spaces (English, German, Spanish, ...).
@@ -148,7 +522,46 @@ class SpaceMorphemizerAleksej_parent(Morphemizer):
     their base forms.
     """
 
+    language = None  # type: str  # suffix of the tables in aleksej_morphemizer_data
+
+    def loadTables(self):
+        """
+        Loads the tables of the language into the class, once per language. Called by the first
+        getMorphemesFromExpr(), not on construction: the preferences and the readability dialog construct every
+        morphemizer to list them.
+        """
+        cls = type(self)
+        cls.tables = loadAleksejTables(cls.language)
+        cls.fullword_dict = cls.tables['FULLWORD_DICT']
+        cls.ending_table = EndingTable(self.get_ending_dict(), self.get_ending_dict_cur_set())
+        from .aleksej_morphemizer_extra import morphemizer_extra_processing
+        cls.extra_processing = staticmethod(morphemizer_extra_processing)
+
+    def get_fullword_dict(self):
+        return self.tables['FULLWORD_DICT']
+
+    def get_ending_dict(self):
+        return self.tables['ENDING_DICT']
+
+    def get_ending_dict_cur_set(self):
+        #XXX: probably actually a list
+        return self.tables['ENDING_DICT_CUR_SET']
+
+    def get_bad_base_forms_even_for_pairs(self):
+        return self.tables['BAD_BASE_FORMS_EVEN_FOR_PAIRS']
+
+    def get_bad_base_forms_case_insensitive(self):
+        return self.tables['BAD_BASE_FORMS_CASE_INSENS']
+
+    def get_bad_base_forms_case_sensitive(self):
+        return self.tables['BAD_BASE_FORMS_CASE_SENS']
+
+    def get_translation_table(self):
+        return self.tables['TRANSLATION_TABLE']
+
     def getMorphemesFromExpr(self, e: str) -> List[Morpheme]:
+        if 'tables' not in type(self).__dict__:
+            self.loadTables()
 
 #        fullword_dict: Dict[str, str] = self.get_fullword_dict()
 #        print(f"getMorphemesFromExpr: e: {e}")
@@ -159,35 +572,23 @@ class SpaceMorphemizerAleksej_parent(Morphemizer):
         BAD_BASE_FORMS_CASE_INSENS: Set[str] = self.get_bad_base_forms_case_insensitive()
         BAD_BASE_FORMS_CASE_SENS: Set[str] = self.get_bad_base_forms_case_sensitive()
         TRANSLATION_TABLE: Dict[str, str] = self.get_translation_table()
+        CLOZE_MARKS: Set[str] = self.tables['CLOZE_MARKS']
+        PAIRS_WORDSEPARATOR: str = self.tables['PAIRS_WORDSEPARATOR']
+        ending_table: EndingTable = self.ending_table
 
         e = e.lower()
-        translation_string = str.maketrans("ſ:{}", "s   ")
-        e = e.translate(translation_string)
-        # remove cloze syntax. Does not work (c1 etc are kept)?!
-        # even the :: are kept?!
-        for i in range(0,5):
-            if '{' not in e:
-                break
-            e = re.sub("\{\{c\\d+::(?P<hidden>.*)::(?P<hint>.*)\}\}(?P<therest>.*)", " \\g<hint> \\g<therest> \\g<hidden>", string=e)
-#        e = re.sub("{{c\d+::(?P<hidden>.*)::(?P<hint>.*)}}", "\g<hidden> \g<hint>", string=e)
-        e = re.sub("\{\{c\\d+::(?P<hidden>.*)\}\}", "\\g<hidden>", string=e)
-        e = re.sub("::", " ", string=e)
-        e = re.sub("(?P<month>jan(uary)?|feb(ruary)?|mar(ch)?|june?|july?|aug(ust)?|sep(t(ember)?)?|oct(ober?)|nov(ember)?|dec(ember)?)\\.? (?P<date>\\d{1,2})(st|nd|rd|th)?, (?P<year>\\d{4})",
-                   "\\g<date> \\g<month> \\g<year>)", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-01-(?P<date>)", "\\g<prechar>\\g<date> january \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-02-(?P<date>)", "\\g<prechar>\\g<date> february \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-03-(?P<date>)", "\\g<prechar>\\g<date> march \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-04-(?P<date>)", "\\g<prechar>\\g<date> april \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-05-(?P<date>)", "\\g<prechar>\\g<date> may \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-06-(?P<date>)", "\\g<prechar>\\g<date> june \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-07-(?P<date>)", "\\g<prechar>\\g<date> july \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-08-(?P<date>)", "\\g<prechar>\\g<date> august \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-09-(?P<date>)", "\\g<prechar>\\g<date> september \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-10-(?P<date>)", "\\g<prechar>\\g<date> october \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-11-(?P<date>)", "\\g<prechar>\\g<date> november \\g<year>", string=e)
-        e = re.sub("(?P<prechar>([^d]|^))(?P<year>1\\d\\d\\d)-12-(?P<date>)", "\\g<prechar>\\g<date> december \\g<year>", string=e)
+        # remove cloze syntax in one pass: "{{c1::hidden::hint}}" -> "   hidden hint  ", nested clozes included. The
+        # cN used to stay between spaces as a word. Three spaces keep that boundary: a word join rule on either side
+        # takes at most one of them
+        if '{{c' in e:
+            e = CLOZE_START_REGEX.sub("   ", e)
+        e = e.translate(ALEKSEJ_TRANSLATION)
+        e = MONTH_NAME_DATE_REGEX.sub("\\g<date> \\g<month> \\g<year>)", e)
+        if ISO_DATE_REGEX.search(e):
+            for month_regex, replacement in ISO_MONTH_REGEXES:
+                e = month_regex.sub(replacement, e)
         # remove character names from the beginning
-        e = morphemizer_extra_processing(e)
+        e = self.extra_processing(e)
 #        e = e.replace(" of the ", " of_englisharticle_")
 #        e = e.replace(" of a ", " of_englisharticle_")
 #        e = e.replace(" of an ", " of_englisharticle_")
@@ -197,38 +598,10 @@ class SpaceMorphemizerAleksej_parent(Morphemizer):
 #        e = e.replace(" with the ", " of_englisharticle_")
 #        e = e.replace(" with a ", " of_englisharticle_")
 #        e = e.replace(" with an ", " of_englisharticle_")
-        e = e.replace(" of the ", "_of the_")
-        e = e.replace(" of a ",   "_of a_")
-        e = e.replace(" of an ",  "_of an_")
-        e = e.replace(" on the ", "_on the_")
-        e = e.replace(" on a ",   "_on a_")
-        e = e.replace(" on an ",  "_on an_")
-        e = re.sub("\\bin the ", "in_the_", string=e)
-        e = re.sub("\\bin the ", "in_the_", string=e)
-        e = re.sub("\\bin a ",   "in_a_", string=e)
-        e = re.sub("\\bin an ",  "in_an_", string=e)
-        e = re.sub("\\bat the ", "at_the_", string=e)
-        e = re.sub("\\bat a ",   "at_a_", string=e)
-        e = re.sub("\\bat an ",  "at_an_", string=e)
-        e = e.replace(" with the ", "_with the_")
-        e = e.replace(" with a ",   "_with a_")
-        e = e.replace(" with an ",  "_with an_")
-        e = e.replace(" off the ", "_off the_")
-        e = e.replace(" off a ",   "_off a_")
-        e = e.replace(" off an ",  "_off an_")
-        e = re.sub("\\bto the ", "to_the_", string=e)
-        e = re.sub("\\bto a ",   "to_a_", string=e)
-        e = re.sub("\\bto an ",  "to_an_", string=e)
-        e = e.replace(" from the ", "_from the_")
-        e = e.replace(" from a ",   "_from a_")
-        e = e.replace(" from an ",  "_from an_")
-        e = re.sub("\\bthe ", "the_", string=e)
-        e = re.sub("\\ba ",   "a_", string=e)
-        e = re.sub("\\ban ",  "an_", string=e)
-        e = re.sub("\\byou can\\b", "you_can", string=e)
-        e = re.sub("\\bi have\\b",  "i_have", string=e)
-        e = re.sub("\\bbe ",        "be_", string=e)
-        e = re.sub("\\byou all\\b",        "you_all", string=e)
+        for literal, regex, replacement in WORD_JOIN_RULES:
+            # a rule can only match if its text is there; 'in' is much cheaper than a regex scan
+            if literal in e:
+                e = e.replace(literal, replacement) if regex is None else regex.sub(replacement, e)
 #        e = e.replace(" you all ",   " you_all ")
 #        e = e.replace(" on the ", " of_englisharticle_")
 #        e = e.replace(" on a ", " of_englisharticle_")
@@ -252,228 +625,48 @@ class SpaceMorphemizerAleksej_parent(Morphemizer):
 #        e = e.replace(" at an ",  " at_an ")
 #        e = e.replace(" at a ",   " at_a ")
 
-        def split_expr_and_correct_case(expr):
-            # type: (str) -> List[str]
-
-
-            # \n\r in the character class doesn't work.
-            word_list_firstsplit: List[str] = re.findall(PRIMARY_PUNCTUATION_REGEXP, expr, re.UNICODE)
-#            word_list_firstsplit = [
-#                # Not word.lower(), because capitalization is grammar in German.
-#                # Lowercasing the rest of the word though.
-#    # XXX: temporarily actually lower() for perfomance reasons
-#                word_firstsplit
-#                # Digits are allowed to let dates and math in. Obvious
-#                # punctuation and cloze deletion is not.
-#                for word_firstsplit in re.findall(r"\b[^\s,;()/]+\b", e, re.UNICODE)
-#            ]
-
-    #            if None in word_list_firstsplit:
-    #                raise TypeError(f"word_list_firstsplit contains Nones: {word_list_firstsplit}")
-#        def correct_case_of_list(word_list):
-#            # type: [str] -> [str]
-#            str_lower = str.lower
-#            return (str_lower(word) for word in word_list)
-
-#            word_list_no_cloze_dcolons: List[str] = []
-#            str_startswith = str.startswith
-#            str_find = str.find
-#            str_split = str.split
-#            list_append = list.append
-#            for word_firstsplit in word_list_firstsplit:
-#                word_no_start_dcolon: str = word_firstsplit
-#                while str_startswith(word_firstsplit, "::"):
-#                    word_no_start_dcolon = word_no_start_dcolon[2:]
-#                if str_find(word_no_start_dcolon, "::") != -1:
-#                    word_no_cloze_dcolon, nextword_no_cloze_dcolon = str_split(word_no_start_dcolon, "::", 1)
-#                    list_append(word_list_no_cloze_dcolons, word_no_cloze_dcolon)
-#                    list_append(word_list_no_cloze_dcolons, nextword_no_cloze_dcolon)
-#                else:
-#                    list_append(word_list_no_cloze_dcolons, word_no_start_dcolon)
-    #                if word_no_start_dcolon:
-    #                    del word_no_start_dcolon
-    #            del word_list_firstsplit
-
-    #            if None in word_list_no_cloze_dcolons:
-    #                raise TypeError(f"There are Nones in word_list_no_cloze_dcolons: {word_list_no_cloze_dcolons}")
-
-            return word_list_firstsplit
-
-
-    # XXX: probably TOO slow:
-    #        def correct_case_of_word(word):
-    #            if len(word) == 1:
-    #                word_correct_case = word.lower()
-    #            else:
-    #                first_letter, lowercase_nonfirst_letters = word[0], word[1:].lower()
-    #                for cyrillic_letter in cyrillic_letters:
-    #                    if cyrillic_letter in lowercase_nonfirst_letters:
-    #                        first_letter = first_letter.lower()
-    #                        break
-    #                word_correct_case = (
-    #                    first_letter + lowercase_nonfirst_letters
-    #                )
-    #            return word_correct_case
-
-        def get_pair_morphemes(words):
-            # type: (List[str]) -> List[Morpheme]
-            """Take a list of words and return a list of pairs as morphs."""
-
-#            pair_string_list = map(pair_join, zip(words[:-1], words[1:]))
-#            pair_list_original = zip(words[:-1], words[1:])
-#            pair_string_list = map(pair_join, pair_list_original)
-#            pair_string_list = map(PAIRS_WORDSEPARATOR.join, pair_list_original)
-#            pair_string_list = [
-#                PAIRS_WORDSEPARATOR.join(pair) for pair in pair_list_original
-#            ]
-            firstwords = words[:-1]
-            secondwords = words[1:]
-            secondwords_without_trailing_punctuation = [word.rstrip(SECONDARY_PUNCTUATION_STRING) for word in secondwords]
-            pair_tuples = zip(firstwords, secondwords_without_trailing_punctuation)
-            pairs = map(PAIRS_WORDSEPARATOR.join, pair_tuples)
-            return [ Morpheme(pair, pair, pair, pair, "PAIR", "UNKNOWN") for pair in pairs ]
-
-        def get_base_form(word: str) -> str:
-
-#            s = self.stemmer_en.stemWord(word)
-#            if s != word:
-#                return s
-#            s = self.stemmer_ru.stemWord(word)
-#            if s != word:
-#                return s
-#            s = self.stemmer_de.stemWord(word)
-#            if s != word:
-#                return s
-#            s = self.stemmer_es.stemWord(word)
-#            if s != word:
-#                return s
-
-            try:
-                return self.fullword_dict[word]
-            except KeyError:
-                str_endswith = str.endswith
-                if word.endswith(tuple(self.ending_dict)):
-                    # twice as fast as just the loop below
-                    for cur_ending in self.ending_dict_cur_set:
-                        if str_endswith(word, cur_ending):
-                            return ''.join([word[: -len(cur_ending)], self.ending_dict[cur_ending]])
-                else:
-                    return word
-            return word
-
-        def remove_bad_base_forms(words: List[str]) -> List[str]:
-            words_no_bad_base_forms: List[str] = [
-                word
-                for word in words
-                if (
-                    word not in BAD_BASE_FORMS_CASE_SENS
-# XXX: note the removal of word.lower() for speed!
-                    and word not in BAD_BASE_FORMS_CASE_INSENS
-#                    and word.lower() not in BAD_BASE_FORMS_CASE_INSENS
-                )
-            ]
-            return words_no_bad_base_forms
-
-        def translate(word: str):
-            """Replace the word with its English equivalent (if available)."""
+        # one pass over the tokens: drop URLs and cloze marks, find the base form, drop very bad base forms, translate,
+        # then emit the word (stripped of punctuation, unless it is a bad base form) and its pair with the previous word
+        fullword_dict: Dict[str, str] = self.fullword_dict
+        word_morphemes: List[Morpheme] = []
+        pair_morphemes: List[Morpheme] = []
+        previous = None  # translated base form of the previous word
+        has_previous = False
+        for word in PRIMARY_PUNCTUATION_REGEX.findall(e):
+            if word.startswith(URL_PREFIXES) or word in CLOZE_MARKS:
+                continue
             try:
-                return TRANSLATION_TABLE[word]
+                base_form = fullword_dict[word]
             except KeyError:
-                return word
-
-        word_list_in_correct_case: List[str] = split_expr_and_correct_case(e)
-        del e
-#        word_list_after_splitting = split_expr(e)
-#        word_list_in_correct_case = correct_case_of_list(word_list_after_splitting)
-#        word_list_in_correct_case = word_list_after_splitting
-    #        del word_list_after_splitting
-    #        if None in word_list_after_splitting:
-    #            raise TypeError(f"word_list_after_splitting contains Nones: {word_list_after_splitting}")
-        str_startswith = str.startswith
-
-        word_list_no_bad_originals: List[str] = [
-            word
-            for word in word_list_in_correct_case
-            if not str_startswith(word, ("http://", "https://"))
-        ]
-        word_list_no_bad_originals: List[str] = [
-            word for word in word_list_no_bad_originals if not word in CLOZE_MARKS
-            ]
+                base_form = ending_table.baseForm(word)
+            if base_form in BAD_BASE_FORMS_EVEN_FOR_PAIRS:
+                continue
+            translated = TRANSLATION_TABLE.get(base_form, base_form)  # its English equivalent, if available
 
+            if has_previous:
+                pair = PAIRS_WORDSEPARATOR.join((previous, translated.rstrip(SECONDARY_PUNCTUATION_STRING)))
+                pair_morphemes.append(Morpheme(pair, pair, pair, pair, "PAIR", "UNKNOWN"))
+            previous, has_previous = translated, True
 
-        base_forms: Iterator[str] = map(get_base_form, word_list_no_bad_originals)
-        del word_list_no_bad_originals
-
-        # Remove base forms that are unacceptable even for pairs
-        base_forms_no_very_bad_base_forms: List[str] = [
-            base_form
-            for base_form in base_forms
-            if base_form not in BAD_BASE_FORMS_EVEN_FOR_PAIRS
-        ]
-        del base_forms
+            word = translated.strip(SECONDARY_PUNCTUATION_STRING)
+            # XXX: note the removal of word.lower() for speed!
+            if word not in BAD_BASE_FORMS_CASE_SENS and word not in BAD_BASE_FORMS_CASE_INSENS:
+                word_morphemes.append(Morpheme(word, word, word, word, "UNKNOWN", "UNKNOWN"))
 
-
-        translated_base_forms: List[str] = list(map(translate, base_forms_no_very_bad_base_forms))
-        pair_morphemes: List[Morpheme] = get_pair_morphemes(translated_base_forms)
-
-        translated_base_forms = [word.strip(SECONDARY_PUNCTUATION_STRING) for word in translated_base_forms]
-
-        base_forms_without_bad_base_forms: List[str] = remove_bad_base_forms(translated_base_forms)
-        del BAD_BASE_FORMS_CASE_SENS
-        del BAD_BASE_FORMS_CASE_INSENS
-        del BAD_BASE_FORMS_EVEN_FOR_PAIRS
-        del TRANSLATION_TABLE
-        del translated_base_forms
-
-        word_morphemes: List[Morpheme] = [
-            Morpheme(word, word, word, word, "UNKNOWN", "UNKNOWN")
-            for word in base_forms_without_bad_base_forms]
-        del base_forms_without_bad_base_forms
-
-        result = word_morphemes + pair_morphemes
-        del word_morphemes, pair_morphemes
-        return result
+        word_morphemes.extend(pair_morphemes)
+        return word_morphemes
 
     def getDescription(self):
         return "Language w/ Spaces, modified by Aleksej"
 
 class SpaceMorphemizerAleksej(SpaceMorphemizerAleksej_parent):
+    language = 'TOTAL'
 
-#    def get_fullword_dict(self):
-    def __init__(self):
-
-#        print("total")
-        SpaceMorphemizerAleksej.fullword_dict = FULLWORD_DICT_TOTAL
-        SpaceMorphemizerAleksej.ending_dict = ENDING_DICT_TOTAL
-        SpaceMorphemizerAleksej.ending_dict_cur_set = ENDING_DICT_CUR_SET_TOTAL
-#
 #        from .deps.snowballstemmer import stemmer
 #        SpaceMorphemizerAleksej.stemmer_en = stemmer('english')
 #        SpaceMorphemizerAleksej.stemmer_ru = stemmer('russian')
 #        SpaceMorphemizerAleksej.stemmer_de = stemmer('german')
 #        SpaceMorphemizerAleksej.stemmer_es = stemmer('spanish')
-#self.fullword_dict = FULLWORD_DICT_TOTAL
-#        return FULLWORD_DICT_TOTAL
-
-    def get_ending_dict(self):
-        return ENDING_DICT_TOTAL
-
-    def get_ending_dict_cur_set(self):
-        #XXX: probably actually a list
-        return ENDING_DICT_CUR_SET_TOTAL
-
-    def get_bad_base_forms_even_for_pairs(self):
-        return BAD_BASE_FORMS_EVEN_FOR_PAIRS_TOTAL
-
-    def get_bad_base_forms_case_insensitive(self):
-        return BAD_BASE_FORMS_CASE_INSENS_TOTAL
-
-    def get_bad_base_forms_case_sensitive(self):
-        return BAD_BASE_FORMS_CASE_SENS_TOTAL
-
-    def get_translation_table(self):
-        return TRANSLATION_TABLE_TOTAL
-
 
 #    def correct_case_of_list(self, word_list_after_splitting):
 #        return [word.lower() for word in word_list_after_splitting]
@@ -482,188 +675,34 @@ class SpaceMorphemizerAleksej(SpaceMorphemizerAleksej_parent):
         return "Language w/ Spaces, modified by Aleksej, total"
 
 class SpaceMorphemizerAleksejEn(SpaceMorphemizerAleksej_parent):
-    def __init__(self):
-#        print("en")
-        SpaceMorphemizerAleksejEn.fullword_dict = FULLWORD_DICT_EN
-        SpaceMorphemizerAleksejEn.ending_dict = ENDING_DICT_EN
-        SpaceMorphemizerAleksejEn.ending_dict_cur_set = ENDING_DICT_CUR_SET_EN
-#        self.fullword_dict = FULLWORD_DICT_EN
-#        ending_dict = ENDING_DICT_EN
-#        ending_dict_cur_set = ENDING_DICT_EN_CUR_SET
-
-    def get_fullword_dict(self):
-        self.fullword_dict = FULLWORD_DICT_EN
-#        return FULLWORD_DICT_EN
-
-    def get_ending_dict(self):
-        return ENDING_DICT_EN
-
-    def get_ending_dict_cur_set(self):
-        return ENDING_DICT_CUR_SET_EN
-
-    def get_bad_base_forms_even_for_pairs(self):
-        return BAD_BASE_FORMS_EVEN_FOR_PAIRS_EN
-
-    def get_bad_base_forms_case_insensitive(self):
-        return BAD_BASE_FORMS_CASE_INSENS_EN
-
-    def get_bad_base_forms_case_sensitive(self):
-        return BAD_BASE_FORMS_CASE_SENS_EN
-
-#    def correct_case_of_list(self, word_list_after_splitting):
-#        return [word.lower() for word in word_list_after_splitting]
-
-    def get_translation_table(self):
-        return TRANSLATION_TABLE_EN
-
+    language = 'EN'
 
     def getDescription(self) -> str:
         return "Language w/ Spaces, modified by Aleksej, English"
 
 class SpaceMorphemizerAleksejDe(SpaceMorphemizerAleksej_parent):
-    def __init__(self):
-#        print("de")
-        SpaceMorphemizerAleksejDe.fullword_dict = FULLWORD_DICT_DE
-        SpaceMorphemizerAleksejDe.ending_dict = ENDING_DICT_DE
-        SpaceMorphemizerAleksejDe.ending_dict_cur_set = ENDING_DICT_CUR_SET_DE
-#        self.fullword_dict = FULLWORD_DICT_DE
-#        ending_dict = ENDING_DICT_DE
-#        ending_dict_cur_set = ENDING_DICT_DE_CUR_SET
-
-    def get_fullword_dict(self):
-        self.fullword_dict = FULLWORD_DICT_DE
-#        return FULLWORD_DICT_DE
-
-    def get_ending_dict(self):
-        return ENDING_DICT_DE
-
-    def get_ending_dict_cur_set(self):
-        return ENDING_DICT_CUR_SET_DE
-
-    def get_bad_base_forms_even_for_pairs(self):
-        return BAD_BASE_FORMS_EVEN_FOR_PAIRS_DE
-
-    def get_bad_base_forms_case_insensitive(self):
-        return BAD_BASE_FORMS_CASE_INSENS_DE
-    
-    def get_bad_base_forms_case_sensitive(self):
-        return BAD_BASE_FORMS_CASE_SENS_DE
+    language = 'DE'
 
     def correct_case_of_list(self, word_list_after_splitting):
         return word_list_after_splitting
 
-    def get_translation_table(self):
-        return TRANSLATION_TABLE_DE
-
     def getDescription(self):
         return "Language w/ Spaces, modified by Aleksej, German"
 
 class SpaceMorphemizerAleksejRu(SpaceMorphemizerAleksej_parent):
-    def __init__(self):
-#        print("ru")
-        SpaceMorphemizerAleksejRu.fullword_dict = FULLWORD_DICT_RU
-        SpaceMorphemizerAleksejRu.ending_dict = ENDING_DICT_RU
-        SpaceMorphemizerAleksejRu.ending_dict_cur_set = ENDING_DICT_CUR_SET_RU
-#       self.fullword_dict = FULLWORD_DICT_RU
-#        ending_dict = ENDING_DICT_RU
-#        ending_dict_cur_set = ENDING_DICT_RU_CUR_SET
-
-    def get_fullword_dict(self):
-        self.fullword_dict = FULLWORD_DICT_RU
-        return FULLWORD_DICT_RU
-
-    def get_ending_dict(self):
-        return ENDING_DICT_RU
-
-    def get_ending_dict_cur_set(self):
-        return ENDING_DICT_CUR_SET_RU
-
-    def get_bad_base_forms_even_for_pairs(self):
-        return BAD_BASE_FORMS_EVEN_FOR_PAIRS_RU
-
-    def get_bad_base_forms_case_insensitive(self):
-        return BAD_BASE_FORMS_CASE_INSENS_RU
-
-    def get_bad_base_forms_case_sensitive(self):
-        return BAD_BASE_FORMS_CASE_SENS_RU
-
-    def get_translation_table(self):
-        return TRANSLATION_TABLE_RU
-
-
-#    def correct_case_of_list(self, word_list_after_splitting):
-#        return [word.lower() for word in word_list_after_splitting]
+    language = 'RU'
 
     def getDescription(self):
         return "Language w/ Spaces, modified by Aleksej, Russian"
 
 class SpaceMorphemizerAleksejEs(SpaceMorphemizerAleksej_parent):
-    def __init__(self):
-#        print("es")
-        self.fullword_dict = FULLWORD_DICT_ES
-        SpaceMorphemizerAleksejEs.ending_dict = ENDING_DICT_ES
-        SpaceMorphemizerAleksejEs.ending_dict = ENDING_DICT_ES
-        SpaceMorphemizerAleksejEs.ending_dict_cur_set = ENDING_DICT_CUR_SET_ES
-#        ending_dict = ENDING_DICT_EN
-#        ending_dict_cur_set = ENDING_DICT_EN_CUR_SET
-
-    def get_fullword_dict(self):
-        return FULLWORD_DICT_ES
-
-    def get_ending_dict(self):
-        return ENDING_DICT_ES
-
-    def get_ending_dict_cur_set(self):
-        return ENDING_DICT_CUR_SET_ES
-
-    def get_bad_base_forms_even_for_pairs(self):
-        return BAD_BASE_FORMS_EVEN_FOR_PAIRS_ES
-
-    def get_bad_base_forms_case_insensitive(self):
-        return BAD_BASE_FORMS_CASE_INSENS_ES
-
-    def get_bad_base_forms_case_sensitive(self):
-        return BAD_BASE_FORMS_CASE_SENS_ES
-
-    def get_translation_table(self):
-        return TRANSLATION_TABLE_ES
-
-#    def correct_case_of_list(self, word_list_after_splitting):
-#        return [word.lower() for word in word_list_after_splitting]
+    language = 'ES'
 
     def getDescription(self) -> str:
         return "Language w/ Spaces, modified by Aleksej, Spanish"
 
 class SpaceMorphemizerAleksejEo(SpaceMorphemizerAleksej_parent):
-    def __init__(self):
-#        print("eo")
-        self.fullword_dict = FULLWORD_DICT_EO
-#        ending_dict = ENDING_DICT_EO
-#        ending_dict_cur_set = ENDING_DICT_EO_CUR_SET
-
-    def get_fullword_dict(self):
-        return FULLWORD_DICT_EO
-
-    def get_ending_dict(self):
-        return ENDING_DICT_EO
-
-    def get_ending_dict_cur_set(self):
-        return ENDING_DICT_CUR_SET_EO
-
-    def get_bad_base_forms_even_for_pairs(self):
-        return BAD_BASE_FORMS_EVEN_FOR_PAIRS_EO
-
-    def get_bad_base_forms_case_insensitive(self):
-        return BAD_BASE_FORMS_CASE_INSENS_EO
-
-    def get_bad_base_forms_case_sensitive(self):
-        return BAD_BASE_FORMS_CASE_SENS_EO
-
-#    def correct_case_of_list(self, word_list_after_splitting):
-#        return [word.lower() for word in word_list_after_splitting]
-
-    def get_translation_table(self):
-        return TRANSLATION_TABLE_EO
+    language = 'EO'
 
     def getDescription(self) -> str:
         return "Language w/ Spaces, modified by Aleksej, Esperanto"
@@ -672,6 +711,17 @@ class SpaceMorphemizerAleksejEo(SpaceMorphemizerAleksej_parent):
 # CJK Character Morphemizer
 ####################################################################################################
 
+_hanzi_regex = None
+
+
+def hanziRegex():
+    global _hanzi_regex
+    if _hanzi_regex is None:
+        from .deps.zhon.hanzi import characters
+        _hanzi_regex = re.compile('[%s]' % characters)
+    return _hanzi_regex
+
+
 class CjkCharMorphemizer(Morphemizer):
     """
     Morphemizer that splits sentence into characters and filters for Chinese-Japanese-Korean logographic/idiographic
@@ -680,7 +730,16 @@ class CjkCharMorphemizer(Morphemizer):
 
     def getMorphemesFromExpr(self, e):
         return [Morpheme(character, character, character, character, 'CJK_CHAR', 'UNKNOWN') for character in
-                re.findall('[%s]' % characters, e)]
+                hanziRegex().findall(e)]
+
+    def getMorphemesFromExprs(self, expressions):
+        starts = joinedStarts(expressions)
+        result = [[] for _ in expressions]
+        for match in hanziRegex().finditer('\n'.join(expressions)):
+            character = match.group()
+            result[bisect_right(starts, match.start()) - 1].append(
+                Morpheme(character, character, character, character, 'CJK_CHAR', 'UNKNOWN'))
+        return result
 
     def getDescription(self):
         return 'CJK Characters'
@@ -690,6 +749,37 @@ class CjkCharMorphemizer(Morphemizer):
 # Jieba Morphemizer (Chinese)
 ####################################################################################################
 
+_jieba_posseg = None
+
+
+def jiebaPosseg(cache_dir):
+    # type: (str) -> Any
+    """
+    deps.jieba.posseg, with jieba's prefix dictionary cache in 'cache_dir' (path_dbs) instead of the temp folder. The cache file is
+    named after the size and mtime of the dictionary, so a changed dictionary is rebuilt instead of read from a stale
+    cache.
+    """
+    global _jieba_posseg
+    if _jieba_posseg is None:
+        from .deps import jieba
+        from .deps.jieba import posseg
+        dt = jieba.dt
+        dict_path = dt.dictionary or os.path.join(os.path.dirname(jieba.__file__), 'dict.txt')
+        try:
+            st = os.stat(dict_path)
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            cache_file = 'jieba.%d.%d.cache' % (st.st_size, int(st.st_mtime))
+            for name in os.listdir(cache_dir):
+                if name.startswith('jieba.') and name.endswith('.cache') and name != cache_file:
+                    os.remove(os.path.join(cache_dir, name))
+            dt.tmp_dir, dt.cache_file = cache_dir, cache_file
+        except OSError:  # keep jieba's own cache in the temp folder
+            pass
+        _jieba_posseg = posseg
+    return _jieba_posseg
+
+
 class JiebaMorphemizer(Morphemizer):
     """
     Jieba Chinese text segmentation: built to be the best Python Chinese word segmentation module.
@@ -697,10 +787,131 @@ class JiebaMorphemizer(Morphemizer):
     """
 
     def getMorphemesFromExpr(self, e):
+        posseg = jiebaPosseg(self.option('path_dbs'))
         # remove all punctuation
-        e = u''.join(re.findall('[%s]' % characters, e))
+        e = u''.join(hanziRegex().findall(e))
         return [Morpheme(m.word, m.word, m.word, m.word, m.flag, u'UNKNOWN') for m in
                 posseg.cut(e)]  # find morphemes using jieba's POS segmenter
 
+    def getMorphemesFromExprs(self, expressions):
+        return parseBatchInWorkers(self, expressions, self.option('jieba processes'))
+
+    def workerOptions(self):
+        return {'path_dbs': self.option('path_dbs'), 'jieba processes': 1}  # a worker parses its batches itself
+
+    def parseBatch(self, expressions):
+        # type: (List[str]) -> List[List[Morpheme]]
+        """
+        One posseg.cut() of the hanzi of all expressions, joined by '\\n'. jieba segments each run of hanzi on its
+        own and gives every whitespace character as a word of its own, so the words are attributed by their offsets.
+        """
+        posseg = jiebaPosseg(self.option('path_dbs'))
+        exprs = [u''.join(hanziRegex().findall(e)) for e in expressions]
+        starts = joinedStarts(exprs)
+        result = [[] for _ in exprs]
+        offset = 0
+        for m in posseg.cut('\n'.join(exprs)):
+            i = bisect_right(starts, offset) - 1
+            offset += len(m.word)
+            if m.word == '\n':
+                continue
+            if offset > starts[i] + len(exprs[i]):  # a word across two expressions, jieba didn't split at the '\n'
+                return [self.getMorphemesFromExpr(e) for e in expressions]
+            result[i].append(Morpheme(m.word, m.word, m.word, m.word, m.flag, u'UNKNOWN'))
+        return result
+
     def getDescription(self):
         return 'Chinese'
+
+
+####################################################################################################
+# Script Dispatch Morphemizer (mixed fields)
+####################################################################################################
+
+# letters of each script. Everything else (spaces, digits, punctuation) belongs to the run it follows
+SCRIPT_RUN_REGEX = re.compile(
+    '(?P<Latin>[A-Za-z\u00C0-\u024F\u1E00-\u1EFF]+)'
+    '|(?P<Cyrillic>[\u0400-\u052F]+)'
+    '|(?P<Greek>[\u0370-\u03FF\u1F00-\u1FFF]+)'
+    '|(?P<Cjk>[\u3005\u3006\u3040-\u30FF\u31F0-\u31FF\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF\uFF66-\uFF9F]+)'
+    '|(?P<Hangul>[\u1100-\u11FF\u3130-\u318F\uAC00-\uD7AF]+)')
+KANA_REGEX = re.compile('[\u3041-\u30FA\u31F0-\u31FF\uFF66-\uFF9D]')
+
+
+def scriptRuns(e):
+    # type: (str) -> List[Tuple[str, str]]
+    """
+    (script, text) of the runs of 'e'. Han is 'Japanese' if the expression has any kana, 'Chinese' otherwise. Text
+    without any letters is one run of script 'other'.
+    """
+    cjk = 'Japanese' if KANA_REGEX.search(e) else 'Chinese'
+    runs = []  # [script, start, end]
+    for m in SCRIPT_RUN_REGEX.finditer(e):
+        script = cjk if m.lastgroup == 'Cjk' else m.lastgroup
+        if not runs:
+            runs.append([script, 0, m.end()])
+        elif runs[-1][0] == script:
+            runs[-1][2] = m.end()
+        else:
+            runs[-1][2] = m.start()
+            runs.append([script, m.start(), m.end()])
+    if not runs:
+        return [('other', e)]
+    runs[-1][2] = len(e)
+    return [(script, e[start:end]) for script, start, end in runs]
+
+
+class ScriptDispatchMorphemizer(Morphemizer):
+    """
+    Splits mixed fields (Russian with English terms, Japanese with Latin names) into runs of one script each and gives
+    each run to the morphemizer set for its script in 'script dispatch morphemizers'. The runs of a batch are sent to
+    each morphemizer in one batch, so per-language tables and tokenizers are only used for the text they are for.
+    """
+
+    def morphemizerForScript(self, targets, script):
+        # type: (Dict[str, Optional[str]], str) -> Optional[Morphemizer]
+        name = targets.get(script, targets.get('other', None))
+        if name is None or name == self.getName():
+            return None
+        if self.options is not None:
+            options = self.options['morphemizer options'].get(name, None)
+            return None if options is None else workerMorphemizer(name, options)
+        return getMorphemizerByName(name)
+
+    def getMorphemesFromExpr(self, expression):
+        return self.getMorphemesFromExprs([expression])[0]
+
+    def getMorphemesFromExprs(self, expressions):
+        targets = self.option('script dispatch morphemizers')
+        runs_of_exprs = [scriptRuns(e) for e in expressions]
+
+        # the texts of all runs per morphemizer, parsed in one batch each
+        texts = {}  # type: Dict[str, List[str]]
+        morphemizers = {}  # type: Dict[str, Morphemizer]
+        for runs in runs_of_exprs:
+            for script, text in runs:
+                m = self.morphemizerForScript(targets, script)
+                if m is not None:
+                    morphemizers[m.getName()] = m
+                    texts.setdefault(m.getName(), []).append(text)
+        parsed = {name: iter(morphemizers[name].getMorphemesFromExprs(ts)) for name, ts in texts.items()}
+
+        result = []
+        for runs in runs_of_exprs:
+            ms = []
+            for script, text in runs:
+                m = self.morphemizerForScript(targets, script)
+                if m is not None:
+                    ms.extend(next(parsed[m.getName()]))
+            result.append(ms)
+        return result
+
+    def workerOptions(self):
+        targets = self.option('script dispatch morphemizers')
+        morphemizers = {name: getMorphemizerByName(name) for name in set(targets.values()) if name is not None}
+        return {'script dispatch morphemizers': targets,
+                'morphemizer options': {name: m.workerOptions() for name, m in morphemizers.items()
+                                        if m is not None and name != self.getName()}}
+
+    def getDescription(self):
+        return 'Mixed scripts, each run to its own morphemizer'
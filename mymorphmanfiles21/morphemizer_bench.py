@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Golden-output check and micro-benchmark for the morphemizers.
+
+Runs every morphemizer (or the ones given with --morphemizer) over morphemizer_bench_corpus.txt, compares the
+morphemes with morphemizer_bench_golden.json, checks that the batch API gives the same morphemes as one expression
+at a time, and reports tokens per second and, for one pass over the corpus, the peak memory allocated and the number
+of memory blocks still allocated at its end (with the morphemes it returned kept).
+
+For the startup cost it also reports how long importing the morphemizer module and constructing every morphemizer
+(as Anki does to list them) takes, and per morphemizer how long its first expression takes, which includes loading
+its dependencies and language tables.
+
+The morphemizers read preferences from a collection, so a collection is needed. Use a copy, for example the recalc
+snapshot, not the collection Anki has open:
+
+    python morphemizer_bench.py --profile ~/.local/share/Anki2/User\ 1 --collection /tmp/copy.anki2
+    python morphemizer_bench.py ... --record    # after an intended change of the output
+
+The checked-in golden output has the morphemizers that need nothing besides the add-on (SpaceMorphemizer,
+CjkCharMorphemizer). Add the others where mecab, jieba or the Aleksej tables are installed, with
+--record --morphemizer <name>, which keeps the golden output of the other morphemizers.
+
+The Aleksej tables are not in the repository, so with --aleksej-fixture the Aleksej morphemizers use the small tables
+of morphemizer_bench_aleksej_fixture.py instead (the cache of the real tables is left alone), and the output is checked
+against morphemizer_bench_fixture_golden.json. That run also has the golden output of JiebaMorphemizer (jieba comes
+with MorphMan) and of ScriptDispatchMorphemizer, with Japanese sent to CjkCharMorphemizer so mecab isn't needed.
+
+Like headless.py this runs as a plain script, so it must not use relative imports.
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(ADDON_DIR, 'morphemizer_bench_corpus.txt')
+GOLDEN_PATH = os.path.join(ADDON_DIR, 'morphemizer_bench_golden.json')
+FIXTURE_GOLDEN_PATH = os.path.join(ADDON_DIR, 'morphemizer_bench_fixture_golden.json')
+FIXTURE_PATH = os.path.join(ADDON_DIR, 'morphemizer_bench_aleksej_fixture.py')
+FIXTURE_SCRIPT_DISPATCH = {
+    'Latin': 'SpaceMorphemizerAleksejEn',
+    'Cyrillic': 'SpaceMorphemizerAleksejRu',
+    'Greek': 'SpaceMorphemizer',
+    'Japanese': 'CjkCharMorphemizer',
+    'Chinese': 'JiebaMorphemizer',
+    'Hangul': 'SpaceMorphemizer',
+    'other': 'SpaceMorphemizerAleksej',
+}
+
+
+def readCorpus(path):
+    # type: (str) -> [str]
+    with open(path, encoding='utf-8') as f:
+        return [l.rstrip('\n') for l in f if l.strip() and not l.startswith('#')]
+
+
+def morphTuples(ms):
+    return [[m.norm, m.base, m.inflected, m.read, m.pos, m.subPos] for m in ms]
+
+
+def benchMorphemizer(morphemizer, corpus, repeat):
+    """
+    Returns (morphemes of each expression, morphemes of the batch, tokens per second, peak bytes of one pass, memory
+    blocks allocated by one pass and still allocated at its end)
+    """
+    expected = [morphTuples(morphemizer.getMorphemesFromExpr(e)) for e in corpus]
+    batch = [morphTuples(ms) for ms in morphemizer.getMorphemesFromExprs(corpus)]
+
+    t_0 = time.perf_counter()
+    n_tokens = 0
+    for _ in range(repeat):
+        for e in corpus:
+            n_tokens += len(morphemizer.getMorphemesFromExpr(e))
+    elapsed = time.perf_counter() - t_0
+
+    tracemalloc.start()
+    results = [morphemizer.getMorphemesFromExpr(e) for e in corpus]
+    peak = tracemalloc.get_traced_memory()[1]
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del results
+    return expected, batch, n_tokens / elapsed if elapsed else 0, peak, blocks
+
+
+def bench(morphemizer_module, names, corpus_path, golden_path, record, repeat):
+    corpus = readCorpus(corpus_path)
+    goldens = {}
+    if os.path.exists(golden_path):
+        with open(golden_path, encoding='utf-8') as f:
+            goldens = json.load(f)
+
+    classes = [cls for cls in morphemizer_module.getMorphemizerClasses() if not names or cls.__name__ in names]
+    t_0 = time.perf_counter()
+    morphemizer_module.getAllMorphemizers()
+    print('constructing all morphemizers: %.1f ms' % (1000 * (time.perf_counter() - t_0)))
+
+    failed = False
+    print('%-28s %12s %12s %12s %12s  %s' % ('morphemizer', 'first ms', 'tokens/s', 'peak KiB', 'blocks', 'result'))
+    for cls in classes:
+        name = cls.__name__
+        try:
+            # a fresh instance, not the registry's, which may be wrapped in the morpheme cache
+            morphemizer = cls()
+            fallbacks = getattr(cls, 'batch_fallbacks', 0)
+            t_0 = time.perf_counter()
+            morphemizer.getMorphemesFromExpr(corpus[0])
+            first = 1000 * (time.perf_counter() - t_0)
+            ms, batch, speed, peak, blocks = benchMorphemizer(morphemizer, corpus, repeat)
+        except Exception as e:  # e.g. mecab is not installed
+            print('%-28s %12s %12s %12s %12s  skipped: %r' % (name, '-', '-', '-', '-', e))
+            continue
+
+        if batch != ms:
+            result = 'FAIL: the batch API differs at expression %d' % next(i for i, (a, b) in enumerate(zip(ms, batch))
+                                                                          if a != b)
+            failed = True
+        elif record:
+            goldens[name] = ms
+            result = 'recorded'
+        elif name not in goldens:
+            result = 'no golden output, run with --record'
+        elif goldens[name] != ms:
+            i = next((i for i, (a, b) in enumerate(zip(goldens[name], ms)) if a != b), min(len(ms), len(goldens[name])))
+            result = 'FAIL: differs from the golden output at expression %d: %r' % (i, corpus[i] if i < len(corpus)
+                                                                                  else '<end of corpus>')
+            failed = True
+        else:
+            result = 'ok'
+        fallbacks = getattr(cls, 'batch_fallbacks', 0) - fallbacks
+        if fallbacks:  # the batch was parsed one expression at a time, see MecabMorphemizer.parseBatch()
+            result += ', %d batches not parsed at once' % fallbacks
+        print('%-28s %12.1f %12.0f %12.1f %12d  %s' % (name, first, speed, peak / 1024.0, blocks, result))
+
+    if record:
+        with open(golden_path, 'w', encoding='utf-8') as f:
+            json.dump(goldens, f, ensure_ascii=False, indent=0, sort_keys=True)
+    return not failed
+
+
+def useAleksejFixture(package):
+    """
+    Makes the add-on 'package' use morphemizer_bench_aleksej_fixture.py as aleksej_morphemizer_data and
+    aleksej_morphemizer_extra, and send Japanese to CjkCharMorphemizer in ScriptDispatchMorphemizer. Must be called
+    before the morphemizer module is imported
+    """
+    spec = importlib.util.spec_from_file_location('%s.morphemizer_bench_aleksej_fixture' % package, FIXTURE_PATH)
+    fixture = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fixture)
+    for name in ('aleksej_morphemizer_data', 'aleksej_morphemizer_extra'):
+        sys.modules['%s.%s' % (package, name)] = fixture
+        setattr(sys.modules[package], name, fixture)
+    headless = importlib.import_module('%s.headless' % package)
+    headless.installPreferences(dict(headless._preferences, **{
+        'script dispatch morphemizers': FIXTURE_SCRIPT_DISPATCH,
+    }))
+
+    # the tables straight from the fixture: the cache of aleksej_data_cache is that of the real tables
+    aleksej_data_cache = importlib.import_module('%s.aleksej_data_cache' % package)
+    aleksej_data_cache.loadAleksejTables = aleksej_data_cache.tablesFromSource
+
+
+def loadMorphemizerModule(profile_folder, collection_path, aleksej_fixture=False):
+    """Imports the add-on's morphemizer module in this process, with a stand-in main window (see headless.py)"""
+    spec = importlib.util.spec_from_file_location('morphman_headless', os.path.join(ADDON_DIR, 'headless.py'))
+    headless = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(headless)
+
+    from anki.storage import Collection
+    package = os.path.basename(ADDON_DIR)
+    bootstrap = {
+        'package': package,
+        'addon_dir': ADDON_DIR,
+        'addons_folder': os.path.dirname(ADDON_DIR),
+        'profile_folder': profile_folder,
+    }
+    headless.loadAddonPackage(bootstrap, Collection(collection_path))
+    if aleksej_fixture:
+        useAleksejFixture(package)
+    t_0 = time.perf_counter()
+    module = importlib.import_module('%s.morphemizer' % package)
+    print('importing morphemizer: %.1f ms' % (1000 * (time.perf_counter() - t_0)))
+    return module
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Check and benchmark the morphemizers against a corpus.')
+    parser.add_argument('--profile', required=True, help='Anki profile folder')
+    parser.add_argument('--collection', required=True, help='a copy of the collection, for the preferences')
+    parser.add_argument('--morphemizer', action='append', default=[], help='only this morphemizer (repeatable)')
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--golden', default=None, help='default: %s, or %s with --aleksej-fixture'
+                                                       % (os.path.basename(GOLDEN_PATH),
+                                                          os.path.basename(FIXTURE_GOLDEN_PATH)))
+    parser.add_argument('--aleksej-fixture', action='store_true',
+                        help='use the tables of %s for the Aleksej morphemizers' % os.path.basename(FIXTURE_PATH))
+    parser.add_argument('--record', action='store_true', help='write the current output as the golden output')
+    parser.add_argument('--repeat', type=int, default=20, help='passes over the corpus for the timing')
+    args = parser.parse_args(argv[1:])
+
+    golden_path = args.golden or (FIXTURE_GOLDEN_PATH if args.aleksej_fixture else GOLDEN_PATH)
+
+    morphemizer_module = loadMorphemizerModule(args.profile, args.collection, args.aleksej_fixture)
+    import aqt
+    try:
+        ok = bench(morphemizer_module, args.morphemizer, args.corpus, golden_path, args.record, args.repeat)
+    finally:
+        aqt.mw.col.close(save=False)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    # don't let the add-on folder shadow other modules when run as a script
+    if sys.path and os.path.abspath(sys.path[0]) == ADDON_DIR:
+        del sys.path[0]
+    sys.exit(main(sys.argv))
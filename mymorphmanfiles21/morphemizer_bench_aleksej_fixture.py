@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+A small stand-in for aleksej_morphemizer_data and aleksej_morphemizer_extra, for morphemizer_bench.py --aleksej-fixture.
+
+The real tables are not part of the add-on's repository. These have a few entries of each kind per language, picked
+for morphemizer_bench_corpus.txt, so the golden output of the Aleksej morphemizers can be checked anywhere. They are not
+meant to be linguistically complete.
+"""
+
+CLOZE_MARKS = {'c%d' % i for i in range(1, 100)}
+PAIRS_WORDSEPARATOR = ' '
+
+FULLWORD_DICT_EN = {'went': 'go', 'sat': 'sit', 'children': 'child', 'were': 'be', 'was': 'be', 'has': 'have',
+                    "i'm": 'i_am', 'born': 'bear', 'died': 'die'}
+ENDING_DICT_EN = {'ies': 'y', 'es': '', 's': '', 'ed': '', 'ing': '', "'s": ''}
+ENDING_DICT_CUR_SET_EN = ["'s", 'ies', 'ing', 'es', 'ed', 's']
+BAD_BASE_FORMS_EVEN_FOR_PAIRS_EN = {'-', 'ha'}
+BAD_BASE_FORMS_CASE_INSENS_EN = {'the', 'a', 'an', 'of', 'and', 'or'}
+BAD_BASE_FORMS_CASE_SENS_EN = {'i'}
+TRANSLATION_TABLE_EN = {}
+
+FULLWORD_DICT_DE = {'läuft': 'laufen', 'habe': 'haben', 'war': 'sein', 'die': 'der', 'des': 'der'}
+ENDING_DICT_DE = {'es': '', 'en': 'en', 'er': '', 'e': ''}
+ENDING_DICT_CUR_SET_DE = ['es', 'er', 'e']
+BAD_BASE_FORMS_EVEN_FOR_PAIRS_DE = {'-'}
+BAD_BASE_FORMS_CASE_INSENS_DE = {'der', 'mit'}
+BAD_BASE_FORMS_CASE_SENS_DE = set()
+TRANSLATION_TABLE_DE = {'hund': 'dog', 'straß': 'street', 'buch': 'book,'}
+
+FULLWORD_DICT_RU = {'пошли': 'идти', 'купили': 'купить', 'читала': 'читать', 'книгу': 'книга'}
+ENDING_DICT_RU = {'ами': '', 'ая': 'ый', 'ой': 'ый', 'а': ''}
+ENDING_DICT_CUR_SET_RU = ['ами', 'ая', 'ой', 'а']
+BAD_BASE_FORMS_EVEN_FOR_PAIRS_RU = {'-'}
+BAD_BASE_FORMS_CASE_INSENS_RU = {'в', 'и', 'не', 'ли'}
+BAD_BASE_FORMS_CASE_SENS_RU = set()
+TRANSLATION_TABLE_RU = {'магазин': 'shop', 'хлеб': 'bread', 'погод': 'weather,'}
+
+FULLWORD_DICT_ES = {'está': 'estar', 'corre': 'correr', 'los': 'el', 'la': 'el'}
+ENDING_DICT_ES = {'os': 'o', 'as': 'a', 's': ''}
+ENDING_DICT_CUR_SET_ES = ['os', 'as', 's']
+BAD_BASE_FORMS_EVEN_FOR_PAIRS_ES = {'-', '¿'}
+BAD_BASE_FORMS_CASE_INSENS_ES = {'el', 'en', 'con'}
+BAD_BASE_FORMS_CASE_SENS_ES = set()
+TRANSLATION_TABLE_ES = {'perro': 'dog', 'parque': 'park'}
+
+FULLWORD_DICT_EO = {'kuris': 'kuri', 'la': 'la'}
+ENDING_DICT_EO = {'oj': 'o', 'on': 'o', 'is': 'i', 'as': 'i'}
+ENDING_DICT_CUR_SET_EO = ['oj', 'on', 'is', 'as']
+BAD_BASE_FORMS_EVEN_FOR_PAIRS_EO = {'-'}
+BAD_BASE_FORMS_CASE_INSENS_EO = {'la', 'en', 'kun'}
+BAD_BASE_FORMS_CASE_SENS_EO = set()
+TRANSLATION_TABLE_EO = {'hundo': 'dog', 'parko': 'park', 'infano': 'child'}
+
+FULLWORD_DICT_TOTAL = {**FULLWORD_DICT_DE, **FULLWORD_DICT_RU, **FULLWORD_DICT_ES, **FULLWORD_DICT_EO,
+                       **FULLWORD_DICT_EN}
+ENDING_DICT_TOTAL = {**ENDING_DICT_RU, **ENDING_DICT_EN}
+ENDING_DICT_CUR_SET_TOTAL = ENDING_DICT_CUR_SET_RU + ENDING_DICT_CUR_SET_EN
+BAD_BASE_FORMS_EVEN_FOR_PAIRS_TOTAL = {'-', '¿', 'ha'}
+BAD_BASE_FORMS_CASE_INSENS_TOTAL = BAD_BASE_FORMS_CASE_INSENS_EN | BAD_BASE_FORMS_CASE_INSENS_RU
+BAD_BASE_FORMS_CASE_SENS_TOTAL = {'i'}
+TRANSLATION_TABLE_TOTAL = {**TRANSLATION_TABLE_DE, **TRANSLATION_TABLE_RU, **TRANSLATION_TABLE_ES,
+                           **TRANSLATION_TABLE_EO}
+
+
+def morphemizer_extra_processing(e):
+    # type: (str) -> str
+    """Drops the dash of a dialogue line"""
+    return e[2:] if e.startswith('- ') else e
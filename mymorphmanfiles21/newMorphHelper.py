@@ -12,10 +12,10 @@ import re
 from aqt.utils import tooltip
 
 from . import main
-from .util import mw, addHook, allDb
+from .util import mw, addHook
 from .preferences import get_preference as cfg
 
-assert isinstance(mw, aqt.main.AnkiQt)
+assert getattr(mw, 'headless', False) or isinstance(mw, aqt.main.AnkiQt)
 
 
 # 1 after answering -> skip all cards with same focus as one just answered
@@ -230,6 +230,7 @@ def highlight(txt, extra, fieldDict, field, mod_field):
     from .util import getFilterByTagsAndType
     from .morphemizer import getMorphemizerByName
     from .morphemes import getMorphemes
+    from .frozen_db import allDbView, maxMaturity
 
     # must avoid formatting a smaller morph that is contained in a bigger morph
     # => do largest subs first and don't sub anything already in <span>
@@ -257,10 +258,10 @@ def highlight(txt, extra, fieldDict, field, mod_field):
     ms = getMorphemes(morphemizer, txt, tags)
 
     proper_nouns_known = cfg('Option_ProperNounsAlreadyKnown')
+    all_db = allDbView()
 
     for m in sorted(ms, key=lambda x: len(x.inflected), reverse=True):  # largest subs first
-        locs = allDb().getMatchingLocs(m)
-        mat = max(loc.maturity for loc in locs) if locs else 0
+        mat = maxMaturity(all_db, m)
 
         if proper_nouns_known and m.isProperNoun():
             mtype = 'mature'
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Read-only view of several MorphDbs as one.
+
+main() used to copy every location of external.db into the freshly built all.db before updating the notes. The
+overlay answers the same queries from all.db, external.db and any extra dbs without copying them. all.db is saved
+before the overlay is built, so it never contains the locations of the other dbs.
+
+The overlay is only used within the recalc. Afterwards the global all.db is a plain MorphDb again (see merged()), as
+other add-ons expect the whole MorphDb API of it.
+"""
+from collections import ChainMap
+from collections.abc import Mapping
+
+from .morphemes import MorphDb
+
+
+class OverlayMorphs(Mapping):
+    """Morpheme -> locations of all the dbs of an overlay. The sets of a morph in several dbs are joined on access"""
+
+    def __init__(self, dbs):
+        self.dbs = dbs
+
+    def __getitem__(self, m):
+        found = [db.db[m] for db in self.dbs if m in db.db]
+        if not found:
+            raise KeyError(m)
+        return found[0] if len(found) == 1 else set().union(*found)
+
+    def __contains__(self, m):
+        return any(m in db.db for db in self.dbs)
+
+    def __iter__(self):
+        seen = set()
+        for db in self.dbs:
+            for m in db.db:
+                if m not in seen:
+                    seen.add(m)
+                    yield m
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class OverlayMorphDb:
+    def __init__(self, *dbs):
+        # type: (MorphDb) -> None
+        self.dbs = dbs  # the first db has precedence for fidDb()
+        self.db = OverlayMorphs(dbs)
+
+    def matches(self, m):
+        return any(db.matches(m) for db in self.dbs)
+
+    def getMatchingLocs(self, m):
+        locs = set()
+        for db in self.dbs:
+            locs.update(db.getMatchingLocs(m))
+        return locs
+
+    def frequency(self, m):
+        return sum(db.frequency(m) for db in self.dbs)
+
+    def locDb(self, recalc=True):
+        return ChainMap(*[db.locDb(recalc) for db in self.dbs])
+
+    def fidDb(self, recalc=True):
+        return ChainMap(*[db.fidDb(recalc) for db in self.dbs])
+
+    def merged(self):
+        # type: () -> MorphDb
+        """The first db with the others merged into it, once the overlay isn't needed anymore. Changes the first db"""
+        base = self.dbs[0]
+        for db in self.dbs[1:]:
+            base.merge(db)
+        return base
+
+
+def overlayDbs(allDb, paths):
+    # type: (MorphDb, [str]) -> OverlayMorphDb
+    """all.db with the dbs at 'paths' on top. dbs that don't exist or are empty are left out"""
+    dbs = [allDb]
+    for path in paths:
+        db = MorphDb(path, ignoreErrors=True)
+        if len(db.db):
+            dbs.append(db)
+    return OverlayMorphDb(*dbs)
@@ -13,11 +13,11 @@ from PyQt5.QtWidgets import *
 
 from . import customTableWidget
 from . import readability_ui
-from .morphemes import Morpheme, MorphDb, getMorphemes, altIncludesMorpheme
+from .morphemes import Morpheme, MorphDb, altIncludesMorpheme
 from .morphemizer import getAllMorphemizers
 from .preferences import get_preference as cfg, update_preferences
+from .readability_analysis import analyzeFiles, isInputFile
 from .util import mw
-from anki.utils import stripHTML
 
 importlib.reload(customTableWidget)
 importlib.reload(readability_ui)
@@ -65,6 +65,10 @@ def getPath(le, caption, open_directory=False):  # LineEdit -> GUI ()
 class CountingMorphDB:
     def __init__(self):
         self.db = {}
+        # group key -> (stamp of exclude_db, [(alt, count)] not marked or excluded, {morph: fuzzy count}). A group's
+        # counts can only change when a morph of the same group is added here or to exclude_db, so they are
+        # recomputed only then
+        self.fuzzy_counts = {}
 
     def addMorph(self, m, count):
         gk = m.getGroupKey()
@@ -74,6 +78,7 @@ class CountingMorphDB:
         if m not in ms:
             ms[m] = [0, False]
         ms[m][0] += count
+        self.fuzzy_counts.pop(gk, None)
 
     def getTotalNormMorphs(self):
         return len(self.db)
@@ -81,19 +86,39 @@ class CountingMorphDB:
     def getTotalVariationMorphs(self):
         return sum([len(ms) for ms in self.db.values()])
 
+    def markMatches(self, db):
+        """Marks the morphs that 'db' matches, which getFuzzyCount() skips from then on. Returns their total count"""
+        total = 0
+        for ms in self.db.values():
+            for m, c in ms.items():
+                if db.matches(m):
+                    total += c[0]
+                    c[1] = True  # mark matched
+        self.fuzzy_counts.clear()
+        return total
+
     def getFuzzyCount(self, m, exclude_db):
         gk = m.getGroupKey()
         if gk not in self.db:
             return 0
+        # exclude_db.matches() of a morph only looks at the morphs of its group
+        stamp = (id(exclude_db), len(exclude_db.groups.get(gk, ())))
+        entry = self.fuzzy_counts.get(gk, None)
+        if entry is None or entry[0] != stamp:
+            alts = [(alt, c[0]) for alt, c in self.db[gk].items()
+                    if not c[1] and not exclude_db.matches(alt)]  # Skip marked and excluded morphs
+            entry = self.fuzzy_counts[gk] = (stamp, alts, {})
+        counts = entry[2]
+        try:
+            return counts[m]
+        except KeyError:
+            pass
+
         count = 0
-        ms = self.db[gk]
-        for alt, c in ms.items():
-            if c[1]:  # Skip marked morphs
-                continue
-            if exclude_db.matches(alt): # Skip excluded morphs
-                continue
+        for alt, c in entry[1]:
             if altIncludesMorpheme(alt, m):  # pylint: disable=W1114 #ToDo: verify if pylint is right
-                count += c[0]
+                count += c
+        counts[m] = count
         return count
 
 class TableInteger(QTableWidgetItem):
@@ -239,157 +264,56 @@ class MorphMan(QDialog):
             known_db = MorphDb()
 
         if master_total_instances > 0:
-            master_current_score = 0
-            for ms in master_db.db.values():
-                for m, c in ms.items():
-                    if known_db.matches(m):
-                        master_current_score += c[0]
-                        c[1] = True  # mark matched
+            master_current_score = master_db.markMatches(known_db)
             self.writeOutput("\n[Current master frequency readability] %0.02f\n" % (
                     master_current_score * 100.0 / master_total_instances))
 
         sources = []
 
-        def measure_readability(file_name, is_ass, is_srt):
-            log_fp.write('measure_readability %s\n' % file_name)
-
-            proper_noun_count = 0
-            i_count = 0
-            line_count = 0
-            line_morphs = []
-            known_line_count = 0
-            iplus1_line_count = 0
-            known_count = 0
-            seen_morphs = {}
-            known_morphs = {}
-            source_unknown_db = CountingMorphDB()
-
-            def proc_lines(text, is_ass, is_srt):
-                text_index = -1
-                num_fields = 1
-                srt_count = 0
-
-                def parse_text(text):
-                    nonlocal i_count, known_count, seen_morphs, known_morphs, all_morphs
-                    nonlocal proper_noun_count, line_count, known_line_count, iplus1_line_count, line_morphs
-
-                    log_fp.write('=== parse_text ===\n' + text + '\n')
-
-                    parsed_morphs = getMorphemes(morphemizer, stripHTML(text))
-                    if len(parsed_morphs) == 0:
-                        return
-
-                    unknown_count = 0
-                    line_missing_morphs = set()
-                    for m in parsed_morphs:
-                        # Count morph for word report
-                        all_morphs[m] = all_morphs.get(m, 0) + 1
-                        seen_morphs[m] = seen_morphs.get(m, 0) + 1
-
-                        if m.isProperNoun():
-                            proper_noun_count += 1
-                            is_proper_noun = True
-                        else:
-                            is_proper_noun = False
-
-                        i_count += 1
-                        if known_db.matches(m) or is_proper_noun: # Proper nouns are easy to learn, so assume they're known.:
-                            known_morphs[m] = known_morphs.get(m, 0) + 1
-                            known_count += 1
-                        else:
-                            unknown_db.addMorph(m, 1)
-                            source_unknown_db.addMorph(m, 1)
-                            line_missing_morphs.add(m)
-                            unknown_count += 1
-                    line_count += 1
-                    if unknown_count == 0:
-                        known_line_count += 1
-                    elif unknown_count == 1:
-                        iplus1_line_count += 1
-                    line_morphs.append(line_missing_morphs)
-
-                filtered_text = ''
-                for t in text.splitlines():
-                    should_flush = True
-                    if is_ass:
-                        if 'Format:' in t:
-                            formats = [x.strip() for x in t[8:].split(',')]
-                            if 'Text' in formats:
-                                text_index = formats.index('Text')
-                                num_fields = len(formats)
-                            else:
-                                text_index = -1
-                            continue
-                        elif ('Dialogue:' not in t) or (text_index < 0):
-                            continue
-                        t = t[9:].split(',', num_fields - 1)
-                        t = t[text_index]
-                    elif is_srt:
-                        srt_count += 1
-                        if srt_count <= 2:
-                            continue
-                        elif t == '':
-                            srt_count = 0
-                        else:
-                            should_flush = False
-                    
-                    if t != '':
-                        filtered_text += t + '\n'
-                    
-                    # Todo: This will flush every line so we can compute per-line readability, which is slower than batching lines.
-                    #       Figure out how to get per-line analysis with batched lines.
-                    if should_flush:
-                    #if len(filtered_text) >= 2048:
-                        parse_text(filtered_text)
-                        filtered_text = ''
-
-                parse_text(filtered_text)
-
-            try:
-                with open(file_name.strip(), 'rt', encoding='utf-8') as f:
-                    print("Analyzing {0}".format(file_name))
-                    try:
-                        input = f.read()
-                    except UnicodeDecodeError:
-                        input = ""
-                    input = input.replace(u'\ufeff', '')
-                    #input = [l.replace(u'\ufeff', '') for l in f.read()]
-                    proc_lines(input, is_ass, is_srt)
-                    source = Source(file_name, seen_morphs, line_morphs, source_unknown_db)
-                    known_percent = 0.0 if len(seen_morphs.keys()) == 0 else 100.0 * len(known_morphs) / len(seen_morphs.keys())
-                    readability = 0.0 if i_count == 0 else 100.0 * known_count / i_count
-                    proper_noun_percent = 0.0 if line_count == 0 else 100.0 * proper_noun_count / i_count
-                    line_percent = 0.0 if line_count == 0 else 100.0 * known_line_count / line_count
-                    iplus1_percent = 0.0 if line_count == 0 else 100.0 * iplus1_line_count / line_count
-
-                    self.writeOutput('%s\t%d\t%d\t%0.2f\t%d\t%d\t%0.2f\t%0.2f\t%0.2f\t%0.2f\n' % (
-                        source.name, len(seen_morphs), len(known_morphs), known_percent, i_count, known_count,
-                        readability, proper_noun_percent, line_percent, iplus1_percent))
-                    row = self.ui.readabilityTable.rowCount()
-                    self.ui.readabilityTable.insertRow(row)
-                    self.ui.readabilityTable.setItem(row, 0, QTableWidgetItem(source.name))
-                    self.ui.readabilityTable.setItem(row, 1, TableInteger(len(seen_morphs)))
-                    self.ui.readabilityTable.setItem(row, 2, TableInteger(len(known_morphs)))
-                    self.ui.readabilityTable.setItem(row, 3, TablePercent(known_percent))
-                    self.ui.readabilityTable.setItem(row, 4, TableInteger(i_count))
-                    self.ui.readabilityTable.setItem(row, 5, TableInteger(known_count))
-                    self.ui.readabilityTable.setItem(row, 6, TablePercent(readability))
-                    self.ui.readabilityTable.setItem(row, 7, TablePercent(proper_noun_percent))
-                    self.ui.readabilityTable.setItem(row, 8, TablePercent(line_percent))
-                    self.ui.readabilityTable.setItem(row, 9, TablePercent(iplus1_percent))
-
-                    if save_study_plan:
-                        sources.append(source)
-            except:
-                self.writeOutput("Failed to process '%s'\n" % file_name)
-                raise
+        def record_readability(analysis):
+            if analysis.error is not None:
+                self.writeOutput("'%s' failed in a worker process and was analyzed in Anki instead: %s\n" % (
+                    analysis.file_name, analysis.error.strip().splitlines()[-1]))
 
-        def accepted_filetype(filename):
-            return filename.lower().endswith(('.srt', '.ass', '.txt'))
+            seen_morphs = analysis.seen_morphs
+            known_morphs = analysis.known_morphs
+            for m, c in seen_morphs.items():
+                all_morphs[m] = all_morphs.get(m, 0) + c
+            source_unknown_db = CountingMorphDB()
+            for m, c in analysis.unknown_morphs.items():
+                unknown_db.addMorph(m, c)
+                source_unknown_db.addMorph(m, c)
+
+            source = Source(analysis.file_name, seen_morphs, analysis.line_morphs, source_unknown_db)
+            i_count, known_count, line_count = analysis.i_count, analysis.known_count, analysis.line_count
+            known_percent = 0.0 if len(seen_morphs.keys()) == 0 else 100.0 * len(known_morphs) / len(seen_morphs.keys())
+            readability = 0.0 if i_count == 0 else 100.0 * known_count / i_count
+            proper_noun_percent = 0.0 if line_count == 0 else 100.0 * analysis.proper_noun_count / i_count
+            line_percent = 0.0 if line_count == 0 else 100.0 * analysis.known_line_count / line_count
+            iplus1_percent = 0.0 if line_count == 0 else 100.0 * analysis.iplus1_line_count / line_count
+
+            self.writeOutput('%s\t%d\t%d\t%0.2f\t%d\t%d\t%0.2f\t%0.2f\t%0.2f\t%0.2f\n' % (
+                source.name, len(seen_morphs), len(known_morphs), known_percent, i_count, known_count,
+                readability, proper_noun_percent, line_percent, iplus1_percent))
+            row = self.ui.readabilityTable.rowCount()
+            self.ui.readabilityTable.insertRow(row)
+            self.ui.readabilityTable.setItem(row, 0, QTableWidgetItem(source.name))
+            self.ui.readabilityTable.setItem(row, 1, TableInteger(len(seen_morphs)))
+            self.ui.readabilityTable.setItem(row, 2, TableInteger(len(known_morphs)))
+            self.ui.readabilityTable.setItem(row, 3, TablePercent(known_percent))
+            self.ui.readabilityTable.setItem(row, 4, TableInteger(i_count))
+            self.ui.readabilityTable.setItem(row, 5, TableInteger(known_count))
+            self.ui.readabilityTable.setItem(row, 6, TablePercent(readability))
+            self.ui.readabilityTable.setItem(row, 7, TablePercent(proper_noun_percent))
+            self.ui.readabilityTable.setItem(row, 8, TablePercent(line_percent))
+            self.ui.readabilityTable.setItem(row, 9, TablePercent(iplus1_percent))
+
+            if save_study_plan:
+                sources.append(source)
 
         list_of_files = list()
         for (dirpath, _, filenames) in os.walk(input_path):
-            list_of_files += [os.path.join(dirpath, filename) for filename in filenames if accepted_filetype(filename)]
+            list_of_files += [os.path.join(dirpath, filename) for filename in filenames if isInputFile(filename)]
 
         self.ui.readabilityTable.clear()
         self.ui.readabilityTable.setRowCount(0)
@@ -403,15 +327,25 @@ class MorphMan(QDialog):
                 "Input", "Total Morphs", "Known Morphs", "% Known Morphs", "Total Instances", "Known Instances",
                 "% Readability", "% Proper Nouns", "% Known Lines", "% i+1 Lines"))
 
-            mw.progress.start( label='Measuring readability', max=len(list_of_files), immediate=True )
-            for n, file_path in enumerate(sorted(list_of_files, key=natural_keys)):
+            file_paths = [p for p in sorted(list_of_files, key=natural_keys) if os.path.isfile(p)]
+            current_path = None
+
+            def progress(n, file_path):
+                nonlocal current_path
+                current_path = file_path
                 mw.progress.update(value=n, label='Parsing (%d/%d) %s' % (
-                    n + 1, len(list_of_files), os.path.basename(file_path)))
-                if os.path.isfile(file_path):
-                    is_ass = os.path.splitext(file_path)[1].lower() == '.ass'
-                    is_srt = os.path.splitext(file_path)[1].lower() == '.srt'
-                    measure_readability(file_path, is_ass, is_srt)
-            mw.progress.finish()
+                    n + 1, len(file_paths), os.path.basename(file_path)))
+
+            mw.progress.start( label='Measuring readability', max=len(file_paths), immediate=True )
+            try:
+                for analysis in analyzeFiles(file_paths, morphemizer, known_db, known_words_path,
+                                             cfg('readability processes'), progress, log_fp):
+                    record_readability(analysis)
+            except:
+                self.writeOutput("Failed to process '%s'\n" % current_path)
+                raise
+            finally:
+                mw.progress.finish()
         else:
             self.writeOutput('\nNo files found to process.\n')
             return
@@ -570,12 +504,7 @@ class MorphMan(QDialog):
                                 print(m[0].base + '\t[score %d ep_freq %d all_freq %d master_freq %d]' % (m[5], m[2], m[3], m[4]), file=f)
                 
                 if master_total_instances > 0:
-                    master_score = 0
-                    for ms in master_db.db.values():
-                        for m, c in ms.items():
-                            if known_db.matches(m):
-                                master_score += c[0]
-                                c[1] = True  # mark matched
+                    master_score = master_db.markMatches(known_db)
                     self.writeOutput("\n[New master frequency readability] %0.02f -> %0.02f\n" % (
                         master_current_score * 100.0 / master_total_instances,
                         master_score * 100.0 / master_total_instances))
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+Per-file part of the readability analyzer, without Qt, so that it can run in worker processes.
+
+analyzeFile() reads one .srt/.ass/.txt file, morphemizes its lines and counts known and unknown morphs against
+known.db. The morphs of each line are kept on disk, keyed by (path, size, mtime, morphemizer), so analyzing the same
+files again after learning some words only counts again. The dialog (readability.py) merges the FileAnalysis of each
+file into its totals and tables in file order.
+"""
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import pickle
+import shutil
+import tempfile
+import traceback
+from itertools import islice
+
+from anki.utils import stripHTML
+
+from . import aleksej_data_cache
+from .morphemes import MorphDb
+from .morphemizer import getMorphemesBatch, workerMorphemizer
+from .preferences import get_preference as cfg
+from .util import printf
+from .worker_pool import WorkerError, getWorkerPool, workersAvailable
+
+
+class FileAnalysis:
+    """The counts of one input file. Picklable, so a worker process can send it back"""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.seen_morphs = {}  # morph -> count
+        self.known_morphs = {}  # morph -> count, proper nouns are known
+        self.unknown_morphs = {}  # morph -> count, in order of first occurrence
+        self.line_morphs = []  # the unknown morphs of each line
+        self.i_count = 0
+        self.known_count = 0
+        self.proper_noun_count = 0
+        self.line_count = 0
+        self.known_line_count = 0
+        self.iplus1_line_count = 0
+        self.log_path = None  # the log written by a worker process, see analyzeFileInWorker()
+        self.error = None  # traceback of a failure in a worker process, the file was then analyzed in Anki's process
+
+    def addLine(self, text, parsed_morphs, known_db, write_log):
+        # the text of a line isn't cached, then it's None
+        if text is not None:
+            write_log('=== parse_text ===\n' + text + '\n')
+        if len(parsed_morphs) == 0:
+            return
+
+        unknown_count = 0
+        line_missing_morphs = set()
+        for m in parsed_morphs:
+            self.seen_morphs[m] = self.seen_morphs.get(m, 0) + 1
+
+            is_proper_noun = m.isProperNoun()
+            if is_proper_noun:
+                self.proper_noun_count += 1
+
+            self.i_count += 1
+            if known_db.matches(m) or is_proper_noun:  # Proper nouns are easy to learn, so assume they're known.
+                self.known_morphs[m] = self.known_morphs.get(m, 0) + 1
+                self.known_count += 1
+            else:
+                self.unknown_morphs[m] = self.unknown_morphs.get(m, 0) + 1
+                line_missing_morphs.add(m)
+                unknown_count += 1
+        self.line_count += 1
+        if unknown_count == 0:
+            self.known_line_count += 1
+        elif unknown_count == 1:
+            self.iplus1_line_count += 1
+        self.line_morphs.append(line_missing_morphs)
+
+
+def subtitleTexts(lines, is_ass, is_srt):
+    # type: (Iterable[str], bool, bool) -> Iterator[str]
+    """Yields the texts of 'lines' that are analyzed as lines: dialogue rows of .ass, blocks of .srt, lines of .txt"""
+    text_index = -1
+    num_fields = 1
+    srt_count = 0
+
+    filtered_text = []
+    for t in lines:
+        should_flush = True
+        if is_ass:
+            if 'Format:' in t:
+                formats = [x.strip() for x in t[8:].split(',')]
+                if 'Text' in formats:
+                    text_index = formats.index('Text')
+                    num_fields = len(formats)
+                else:
+                    text_index = -1
+                continue
+            elif ('Dialogue:' not in t) or (text_index < 0):
+                continue
+            t = t[9:].split(',', num_fields - 1)
+            t = t[text_index]
+        elif is_srt:
+            srt_count += 1
+            if srt_count <= 2:
+                continue
+            elif t == '':
+                srt_count = 0
+            else:
+                should_flush = False
+
+        if t != '':
+            filtered_text.append(t + '\n')
+
+        # every line is a text of its own for the per-line readability. analyzeFile() morphemizes them in batches
+        if should_flush:
+            yield ''.join(filtered_text)
+            filtered_text = []
+
+    yield ''.join(filtered_text)
+
+
+# input files, also compressed with one of COMPRESSED_EXTENSIONS, like 'episode 01.srt.gz'
+INPUT_EXTENSIONS = ('.srt', '.ass', '.txt')
+COMPRESSED_EXTENSIONS = {'.gz': gzip.open, '.xz': lzma.open}
+
+
+def inputExtension(file_name):
+    # type: (str) -> str
+    """'.srt' for 'a.srt' and 'a.srt.gz'"""
+    root, extension = os.path.splitext(file_name.lower())
+    if extension in COMPRESSED_EXTENSIONS:
+        extension = os.path.splitext(root)[1]
+    return extension
+
+
+def isInputFile(file_name):
+    # type: (str) -> bool
+    return inputExtension(file_name) in INPUT_EXTENSIONS
+
+
+def openInputFile(file_name):
+    path = file_name.strip()
+    open_file = COMPRESSED_EXTENSIONS.get(os.path.splitext(path.lower())[1], open)
+    return open_file(path, 'rt', encoding='utf-8')
+
+
+def inputLines(f, write_log):
+    """
+    Yields the lines of the file 'f' as str.splitlines() of the whole text would, without reading it all at once.
+    Reading stops at text that isn't UTF-8
+    """
+    try:
+        for line in f:
+            yield from line.replace(u'\ufeff', '').splitlines()
+    except UnicodeDecodeError as e:
+        write_log('not UTF-8, the rest of the file is skipped: %s\n' % e)
+
+
+# lines of a file given to the morphemizer at once. The morphemizers split a batch back into its lines, so the per-line
+# counts are the same as with one line at a time
+LINES_PER_BATCH = 5000
+
+
+# bump when what analyzeFile() caches changes, to ignore old cache files
+CACHE_VERSION = 1
+
+
+# the preferences getMorphemes() reads besides those of the morphemizer
+PARSE_PREFERENCES = ('Option_IgnoreBracketContents', 'Option_IgnoreRoundBracketContents',
+                     'Option_IgnoreSlimRoundBracketContents', 'ReplaceRules')
+
+
+def parseSettingsHash(morphemizer):
+    # type: (Morphemizer) -> str
+    """
+    Hash of what the morphs of a line depend on besides its text and the morphemizer: the preferences the morphemizer
+    reads (its workerOptions(), which a worker process has as its options), those of getMorphemes() and the source of
+    the Aleksej tables
+    """
+    options = morphemizer.workerOptions() if morphemizer.options is None else morphemizer.options
+    preferences = {}
+    for key in PARSE_PREFERENCES:
+        try:
+            preferences[key] = cfg(key)
+        except KeyError:  # not a preference of this MorphMan version
+            preferences[key] = None
+    try:
+        tables = aleksej_data_cache.sourceHash()
+    except IOError:  # only the cache of the tables was copied
+        tables = None
+    settings = json.dumps([options, preferences, tables], sort_keys=True, default=repr)
+    return hashlib.sha1(settings.encode('utf-8')).hexdigest()
+
+
+def cacheEntry(file_name, morphemizer, cache_dir):
+    # type: (str, Morphemizer, Optional[str]) -> Tuple[Optional[str], Optional[tuple]]
+    """
+    (path of the cache file in 'cache_dir', key) of the morphs of 'file_name' parsed with 'morphemizer', or (None, None)
+    if there is no cache. The key has the size and mtime of the file and parseSettingsHash(), so a changed file, or one
+    that would be parsed differently, is parsed again
+    """
+    if not cache_dir:
+        return None, None
+    path = os.path.abspath(file_name.strip())
+    st = os.stat(path)
+    name = hashlib.sha1(('%s\t%s' % (path, morphemizer.getName())).encode('utf-8')).hexdigest()
+    return (os.path.join(cache_dir, name + '.pickle.gz'),
+            (CACHE_VERSION, path, st.st_size, st.st_mtime_ns, morphemizer.getName(), parseSettingsHash(morphemizer)))
+
+
+def loadCachedLines(cache_path, key):
+    # type: (str, tuple) -> Optional[List[List[Morpheme]]]
+    try:
+        with gzip.open(cache_path) as f:
+            cached_key, lines = pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError):
+        return None
+    return lines if cached_key == key else None
+
+
+def saveCachedLines(cache_path, key, lines):
+    # type: (str, tuple, List[List[Morpheme]]) -> None
+    try:
+        if not os.path.exists(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        tmp_path = cache_path + '.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            pickle.dump((key, lines), f, -1)
+        os.replace(tmp_path, cache_path)
+    except (IOError, OSError) as e:
+        printf('Could not cache the morphs of %s: %s' % (key[1], e))
+
+
+def analyzeFile(file_name, morphemizer, known_db, cache_dir, log_fp):
+    # type: (str, Morphemizer, MorphDb, Optional[str], TextIO) -> FileAnalysis
+    """
+    The lines are read, morphemized and counted in batches, so only one batch of the file is in memory at a time. The
+    morphs of each line are cached in 'cache_dir' (see cacheEntry()), so a later run only counts them against known_db
+    again
+    """
+    analysis = FileAnalysis(file_name)
+    write_log = log_fp.write
+    write_log('measure_readability %s\n' % file_name)
+    extension = inputExtension(file_name)
+
+    cache_path, key = cacheEntry(file_name, morphemizer, cache_dir)
+    cached_lines = None if cache_path is None else loadCachedLines(cache_path, key)
+    if cached_lines is not None:
+        write_log('morphs from the cache %s\n' % cache_path)
+        for parsed_morphs in cached_lines:
+            analysis.addLine(None, parsed_morphs, known_db, write_log)
+        return analysis
+
+    parsed_lines = None if cache_path is None else []
+    with openInputFile(file_name) as f:
+        print("Analyzing {0}".format(file_name))
+        texts = subtitleTexts(inputLines(f, write_log), extension == '.ass', extension == '.srt')
+        while True:
+            chunk = list(islice(texts, LINES_PER_BATCH))
+            if not chunk:
+                break
+            for text, parsed_morphs in zip(chunk, getMorphemesBatch(morphemizer, [stripHTML(t) for t in chunk])):
+                analysis.addLine(text, parsed_morphs, known_db, write_log)
+                if parsed_lines is not None:
+                    parsed_lines.append(parsed_morphs)
+    if parsed_lines is not None:
+        saveCachedLines(cache_path, key, parsed_lines)
+    return analysis
+
+
+# known.db of a worker process: ((path, size, mtime), MorphDb), loaded once and used for all its files
+_worker_known_db = None
+
+
+def workerKnownDb(path):
+    # type: (str) -> MorphDb
+    global _worker_known_db
+    try:
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime)
+    except OSError:
+        key = (path, None, None)
+    if _worker_known_db is None or _worker_known_db[0] != key:
+        db = MorphDb(path, ignoreErrors=True) if key[1] is not None else MorphDb()
+        _worker_known_db = (key, db)
+    return _worker_known_db[1]
+
+
+def analyzeFileInWorker(file_name, morphemizer_name, morphemizer_options, known_db_path, cache_dir):
+    # type: (str, str, Dict[str, Any], str, Optional[str]) -> FileAnalysis
+    """
+    Entry of the readability worker processes. They have no collection, so the preferences come with the request (see
+    workerMorphemizer()). A failure is returned, and analyzeFiles() analyzes that file again in Anki's process.
+
+    The log goes to a temporary file, whose path is sent back instead of the log itself: it has every line of the file
+    """
+    log_fd, log_path = tempfile.mkstemp(prefix='morphman_readability_', suffix='.log')
+    try:
+        with open(log_fd, 'wt', encoding='utf-8') as log_fp:
+            analysis = analyzeFile(file_name, workerMorphemizer(morphemizer_name, morphemizer_options),
+                                   workerKnownDb(known_db_path), cache_dir, log_fp)
+    except Exception:
+        os.remove(log_path)  # the file is analyzed again, with its log
+        return failedAnalysis(file_name, traceback.format_exc())
+    analysis.log_path = log_path
+    return analysis
+
+
+def copyWorkerLog(analysis, log_fp):
+    # type: (FileAnalysis, TextIO) -> None
+    """Appends the log of a file analyzed in a worker process to 'log_fp', and removes it"""
+    try:
+        with open(analysis.log_path, encoding='utf-8') as f:
+            shutil.copyfileobj(f, log_fp)
+    finally:
+        os.remove(analysis.log_path)
+        analysis.log_path = None
+
+
+def failedAnalysis(file_name, error):
+    # type: (str, str) -> FileAnalysis
+    analysis = FileAnalysis(file_name)
+    analysis.error = error
+    return analysis
+
+
+# files given to the workers between two progress updates, per worker
+FILES_PER_WORKER_STEP = 4
+
+
+def analyzeFiles(file_names, morphemizer, known_db, known_db_path, n_processes, progress, log_fp):
+    """
+    Yields the FileAnalysis of each of 'file_names', in order. With more than one process the files are analyzed in
+    worker processes, which load known.db from 'known_db_path' once instead of being sent 'known_db' with every file.
+    progress(n, file_name) is called before file n (or before a step of files that starts with file n) is analyzed.
+    Files analyzed in this process write their log to 'log_fp' directly, the others to a temporary file that is appended
+    to 'log_fp' when their FileAnalysis is yielded. A file that failed in a worker is analyzed again in this process,
+    so only a failure there stops the analysis; its FileAnalysis.error has the worker's traceback, for the dialog to
+    report.
+    """
+    cache_dir = cfg('path_readability_cache')
+    if n_processes <= 1 or len(file_names) < 2 or not workersAvailable():
+        for n, file_name in enumerate(file_names):
+            progress(n, file_name)
+            yield analyzeFile(file_name, morphemizer, known_db, cache_dir, log_fp)
+        return
+
+    pool = getWorkerPool('readability', n_processes)
+    name, options = morphemizer.getName(), morphemizer.workerOptions()
+    step = n_processes * FILES_PER_WORKER_STEP
+    for start in range(0, len(file_names), step):
+        chunk = file_names[start:start + step]
+        progress(start, chunk[0])
+        try:
+            results = pool.map('readability_analysis.analyzeFileInWorker',
+                               [(file_name, name, options, known_db_path, cache_dir) for file_name in chunk])
+        except (WorkerError, EOFError, OSError) as e:
+            results = [failedAnalysis(file_name, 'the worker processes failed: %s' % e) for file_name in chunk]
+        for n, (file_name, analysis) in enumerate(zip(chunk, results)):
+            if analysis.error is not None:
+                printf('Readability worker failed on %s, analyzing it in this process:\n%s' % (
+                    file_name, analysis.error))
+                progress(start + n, file_name)
+                error = analysis.error
+                analysis = analyzeFile(file_name, morphemizer, known_db, cache_dir, log_fp)
+                analysis.error = error
+            else:
+                copyWorkerLog(analysis, log_fp)
+            yield analysis
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Recalc in a separate Python process.
+
+Building all.db needs a lot of memory, and Python rarely returns a fragmented heap to the OS, so after a recalc Anki
+keeps that memory until it is restarted. In this mode the collection is copied to a snapshot, a headless process
+(see headless.py) runs the whole recalc against the snapshot and only the resulting note and card updates are sent
+back and applied here. Anki itself never holds all.db, only its frozen view (see frozen_db.py).
+"""
+import gzip
+import os
+import pickle
+import shutil
+import subprocess
+import time
+
+from anki.utils import intTime
+
+from . import stats
+from . import util
+from .frozen_db import FrozenMorphDb, loadFrozenAllDb
+from .headless import NoPythonError, workerCommand
+from .preferences import get_preference as cfg
+from .util import printf, mw, errorMsg
+
+
+def snapshotCollection(path):
+    """Writes a consistent copy of the open collection to 'path'"""
+    par = os.path.split(path)[0]
+    if not os.path.exists(par):
+        os.makedirs(par)
+    if os.path.exists(path):
+        os.remove(path)
+
+    mw.col.save()
+    try:
+        mw.col.db.execute('vacuum into ?', path)
+    except Exception:  # sqlite < 3.27
+        mw.col.close()
+        try:
+            shutil.copy2(mw.col.path, path)
+        finally:
+            mw.col.reopen()
+
+
+def recalcOutOfProcess():
+    """Starts the recalc process and returns, its updates are applied when it has exited"""
+    t_0 = time.time()
+    snapshot_path = cfg('path_recalc_snapshot')
+    result_path = snapshot_path + '.result'
+    log_path = snapshot_path + '.log'
+    try:
+        cmd = workerCommand('recalc_process.recalcSnapshot', snapshot_path=snapshot_path, result_path=result_path)
+    except NoPythonError as e:
+        errorMsg("Can't recalc in a separate process: %s" % e)
+        return
+
+    mw.progress.start(label='Creating collection snapshot', immediate=True)
+    try:
+        snapshotCollection(snapshot_path)
+        if os.path.exists(result_path):
+            os.remove(result_path)
+
+        mw.progress.update(label='Recalculating in a separate process')
+        with open(log_path, 'wb') as log:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+    except BaseException:
+        mw.progress.finish()
+        raise
+
+    # poll from the event loop, so Anki stays responsive while the process runs
+    def poll():
+        if proc.poll() is None:
+            mw.progress.update()
+            return
+        timer.stop()
+        finishRecalcOutOfProcess(proc, t_0, snapshot_path, result_path, log_path)
+
+    timer = mw.progress.timer(100, poll, True)
+
+
+def finishRecalcOutOfProcess(proc, t_0, snapshot_path, result_path, log_path):
+    """Applies the updates of the recalc process once it has exited"""
+    ok = proc.returncode == 0 and os.path.exists(result_path)
+    try:
+        if ok:
+            printf('Out-of-process recalc finished in %f sec' % (time.time() - t_0))
+            mw.progress.update(label='Updating anki database...')
+            with gzip.open(result_path) as f:
+                result = pickle.load(f)
+            applySnapshotUpdates(result['notes'], result['cards'])
+            os.remove(result_path)
+            os.remove(snapshot_path)
+    finally:
+        mw.progress.finish()
+
+    if not ok:
+        with open(log_path, encoding='utf-8', errors='replace') as log:
+            tail = log.read()[-2000:]
+        errorMsg('Recalc in a separate process failed (exit code %s). Last output:\n\n%s' % (proc.returncode, tail))
+        return
+    mw.reset()
+
+    # the worker has written known.db
+    stats.updateStats()
+    mw.toolbar.draw()
+
+    # without the frozen view all.db is loaded when it is first queried
+    util._allDb = loadFrozenAllDb()
+    printf('Recalc + applying updates in %f sec' % (time.time() - t_0))
+
+
+def applySnapshotUpdates(note_ds, card_ds):
+    """
+    Applies updates computed from the snapshot. Notes and cards that were changed in Anki while the worker was running
+    are skipped; they will be picked up by the next recalc.
+    """
+    now, usn = intTime(), mw.col.usn()
+    for d in note_ds:
+        d['now'], d['usn'] = now, usn
+    for d in card_ds:
+        d['now'], d['usn'] = now, usn
+    mw.col.db.executemany(
+        'update notes set tags=:tags, flds=:flds, sfld=:sfld, csum=:csum, mod=:now, usn=:usn '
+        'where id=:nid and mod=:oldmod', note_ds)
+    mw.col.db.executemany(
+        'update cards set due=:due, mod=:now, usn=:usn where id=:cid and due=:olddue and type = 0', card_ds)
+    mw.col.tags.registerNotes([d['nid'] for d in note_ds])
+
+
+########## runs in the headless process
+def recalcSnapshot(snapshot_path, result_path):
+    from anki.storage import Collection
+    from . import main
+
+    mw.col = Collection(snapshot_path)
+    try:
+        old_mods = dict(mw.col.db.execute('select id, mod from notes'))
+        old_dues = dict(mw.col.db.execute('select id, due from cards where type = 0'))
+        updates = {}
+
+        def collectUpdates(note_ds, card_ds):
+            updates['notes'] = [
+                {'tags': d['tags'], 'flds': d['flds'], 'sfld': d['sfld'], 'csum': d['csum'], 'nid': d['nid'],
+                 'oldmod': old_mods[d['nid']]} for d in note_ds]
+            updates['cards'] = [
+                {'due': d['due'], 'cid': d['cid'], 'olddue': old_dues[d['cid']]} for d in card_ds]
+
+        result = main.recalc(collectUpdates)
+        if result is None:
+            raise SystemExit(1)
+        allDb, knownDb = result
+        # the Anki process reads the stats from known.db and queries the frozen all.db
+        if not cfg('saveDbs'):
+            knownDb.save(cfg('path_known'))
+        FrozenMorphDb(allDb).save(cfg('path_all_frozen'))
+    finally:
+        mw.col.close(save=False)
+
+    tmp_path = result_path + '.tmp'
+    with gzip.open(tmp_path, 'wb') as f:
+        pickle.dump(updates, f, -1)
+    os.replace(tmp_path, result_path)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Loads the add-on in the test process the way a worker process loads it (see headless.py).
+
+The tests run in the installed add-on folder, next to MorphMan's own modules (morphemes.py, preferences.py, ...), with
+a Python that can import anki and aqt:
+
+    python -m unittest discover -s <add-on folder>/tests
+
+There is no collection: the preferences are config.py's defaults for a temporary profile plus TEST_PREFERENCES, and
+the workers started by a test get the same ones.
+"""
+import importlib
+import importlib.util
+import os
+import tempfile
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the preferences of MorphMan's Preferences dialog that the tested code reads, at their defaults
+TEST_PREFERENCES = {
+    'Option_IgnoreBracketContents': False,
+    'Option_IgnoreRoundBracketContents': False,
+    'Option_IgnoreSlimRoundBracketContents': False,
+    'Option_IgnoreGrammarPosition': False,
+    'Option_ProperNounsAlreadyKnown': False,
+}
+
+_package = None
+
+
+def addonModule(name):
+    """The add-on module 'name'. The package is loaded with a stand-in main window on first use"""
+    global _package
+    if _package is None:
+        spec = importlib.util.spec_from_file_location('morphman_headless', os.path.join(ADDON_DIR, 'headless.py'))
+        headless = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(headless)
+        package = os.path.basename(ADDON_DIR)
+        headless.loadAddonPackage({
+            'package': package,
+            'addon_dir': ADDON_DIR,
+            'addons_folder': os.path.dirname(ADDON_DIR),
+            'profile_folder': tempfile.mkdtemp(prefix='morphman_test_'),
+        })
+        # before the other add-on modules are imported, so they bind the installed get_preference
+        config = importlib.import_module('%s.config' % package)
+        importlib.import_module('%s.headless' % package).installPreferences(dict(config.default, **TEST_PREFERENCES))
+        _package = package
+    return importlib.import_module('%s.%s' % (_package, name))
+
+
+def setPreferences(preferences):
+    # type: (dict) -> dict
+    """Changes preferences of the test process and of the workers it starts. Returns the previous values"""
+    headless = addonModule('headless')
+    snapshot = dict(headless._preferences)
+    previous = {key: snapshot.get(key, None) for key in preferences}
+    snapshot.update(preferences)
+    headless.installPreferences(snapshot)
+    return previous
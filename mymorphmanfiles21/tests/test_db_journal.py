@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from addon import addonModule, setPreferences
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dj = addonModule('db_journal')
+        self.folder = tempfile.mkdtemp(prefix='morphman_journal_')
+        self.path = os.path.join(self.folder, 'all.db')
+        self.jpath = self.dj.journalPath(self.path)
+        self.dj.saveMorphDb(addonModule('morphemes').MorphDb(), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def writeJournal(self, n):
+        """Appends n deltas, returns the offsets of the ends of their frames"""
+        ends = []
+        with open(self.jpath, 'ab') as f:
+            for i in range(n):
+                delta = self.dj.AllDbDelta()
+                delta.maturities[(i, 'guid%d' % i, 'Expression')] = [1.0, 2.0]
+                self.dj.writeDelta(f, delta)
+                ends.append(f.tell())
+        return ends
+
+    def testTornFrameIsCutOff(self):
+        ends = self.writeJournal(3)
+        with open(self.jpath, 'r+b') as f:
+            f.truncate((ends[1] + ends[2]) // 2)  # in the middle of the third frame
+
+        with open(self.jpath, 'rb') as f:
+            self.assertEqual([end for _, end in self.dj.readDeltas(f)], ends[:2])
+        db = self.dj.loadJournaled(self.path)
+        self.assertEqual(os.path.getsize(self.jpath), ends[1])
+
+        # the next save compacts instead of appending to the journal that lost an entry
+        self.dj.saveJournaled(db, self.path, self.dj.AllDbDelta())
+        self.assertFalse(os.path.exists(self.jpath))
+
+    def testDamagedFrameStopsTheReplay(self):
+        ends = self.writeJournal(3)
+        with open(self.jpath, 'r+b') as f:
+            f.seek(ends[0] + self.dj.FRAME_HEADER.size + 2)
+            f.write(b'\xff\xff')  # the second frame no longer matches its checksum
+        with open(self.jpath, 'rb') as f:
+            self.assertEqual([end for _, end in self.dj.readDeltas(f)], ends[:1])
+        self.dj.loadJournaled(self.path)
+        self.assertEqual(os.path.getsize(self.jpath), ends[0])
+
+    def testDeltasAreAppended(self):
+        # the base is an empty db
+        self.addCleanup(setPreferences, setPreferences({'all.db journal compaction ratio': 1000}))
+        db = self.dj.loadJournaled(self.path)
+        delta = self.dj.AllDbDelta()
+        delta.maturities[(1, 'guid', 'Expression')] = [1.0]
+        self.dj.saveJournaled(db, self.path, delta)
+        self.dj.saveJournaled(db, self.path, delta)
+        with open(self.jpath, 'rb') as f:
+            self.assertEqual(len(list(self.dj.readDeltas(f))), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from addon import addonModule
+
+
+class MecabBatchTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            addonModule('mecab_wrapper').getMorphemesMecab('日本語')
+        except Exception as e:
+            self.skipTest('mecab is not available: %r' % e)
+
+    def testBatchIsParsedAtOnce(self):
+        morphemizer = addonModule('morphemizer').MecabMorphemizer()
+        expressions = ['今日は雨です。', '猫が好きだ', 'テレビを見ました', '東京に行きました。']
+        fallbacks = morphemizer.batch_fallbacks
+        batch = morphemizer.parseBatch(expressions)
+        self.assertEqual(morphemizer.batch_fallbacks, fallbacks, 'mecab dropped the separator node')
+        self.assertEqual(batch, [morphemizer.getMorphemesFromExpr(e) for e in expressions])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from addon import addonModule, setPreferences
+
+TEXTS = [
+    'The cat sat on the mat.\nThe dog did not.\n',
+    'A cat and a dog.\n',
+    'Nothing but the mat.\nThe cat again.\nAnd the dog.\n',
+]
+
+
+class AnalyzeFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.ra = addonModule('readability_analysis')
+        # parse every file in both runs
+        self.addCleanup(setPreferences, setPreferences({'path_readability_cache': None}))
+        self.folder = tempfile.mkdtemp(prefix='morphman_readability_')
+        self.file_names = []
+        for i, text in enumerate(TEXTS * 2):
+            path = os.path.join(self.folder, '%d.txt' % i)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            self.file_names.append(path)
+        self.morphemizer = addonModule('morphemizer').getMorphemizerByName('SpaceMorphemizer')
+        self.known_db = addonModule('morphemes').MorphDb()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def analyze(self, n_processes):
+        log_fp = io.StringIO()
+        analyses = list(self.ra.analyzeFiles(self.file_names, self.morphemizer, self.known_db,
+                                             os.path.join(self.folder, 'known.db'), n_processes, lambda n, f: None,
+                                             log_fp))
+        return analyses, log_fp.getvalue()
+
+    def testWorkersAnalyzeEveryFile(self):
+        if not addonModule('worker_pool').workersAvailable():
+            self.skipTest('no Python interpreter for worker processes')
+        in_process, in_process_log = self.analyze(1)
+        in_workers, in_workers_log = self.analyze(2)
+        self.assertEqual([a.error for a in in_workers], [None] * len(self.file_names))  # none was analyzed again here
+        self.assertEqual([a.file_name for a in in_workers], self.file_names)
+        for a, b in zip(in_process, in_workers):
+            self.assertEqual((a.i_count, a.line_count, a.unknown_morphs), (b.i_count, b.line_count, b.unknown_morphs))
+        # the workers' logs were copied in file order, and removed
+        self.assertEqual(in_workers_log, in_process_log)
+        self.assertEqual([a.log_path for a in in_workers], [None] * len(self.file_names))
+
+
+class CacheEntryTest(unittest.TestCase):
+    def setUp(self):
+        self.ra = addonModule('readability_analysis')
+        self.folder = tempfile.mkdtemp(prefix='morphman_readability_')
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.file_name = os.path.join(self.folder, 'a.txt')
+        with open(self.file_name, 'w', encoding='utf-8') as f:
+            f.write(TEXTS[0])
+
+    def key(self, morphemizer):
+        return self.ra.cacheEntry(self.file_name, morphemizer, self.folder)[1]
+
+    def testKeyHasTheParsePreferences(self):
+        morphemizer = addonModule('morphemizer').getMorphemizerByName('SpaceMorphemizer')
+        key = self.key(morphemizer)
+        self.assertEqual(self.key(morphemizer), key)
+        self.addCleanup(setPreferences, setPreferences({'Option_IgnoreBracketContents': True}))
+        self.assertNotEqual(self.key(morphemizer), key)
+
+    def testWorkerHasTheSameKey(self):
+        morphemizer_module = addonModule('morphemizer')
+        morphemizer = morphemizer_module.JiebaMorphemizer()
+        key = self.key(morphemizer)
+        options = morphemizer.workerOptions()
+        self.assertEqual(self.key(morphemizer_module.workerMorphemizer('JiebaMorphemizer', options)), key)
+        options = dict(options, path_dbs=os.path.join(self.folder, 'other'))
+        self.assertNotEqual(self.key(morphemizer_module.workerMorphemizer('JiebaMorphemizer', options)), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
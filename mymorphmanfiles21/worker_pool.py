@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of persistent headless worker processes.
+
+Work that is CPU bound, or that waits on a subprocess like mecab, can be spread over several Python processes. Each
+worker is a headless process (see headless.py) that stays up between requests: it reads a pickled (entry, args,
+preferences) frame from its stdin, calls 'entry' (a 'module.function' of this add-on) and writes a pickled (ok, result)
+frame to its stdout. A worker has no collection to read the preferences from, so every request brings a snapshot of
+them, installed before the first add-on module is imported (see headless.installPreferences()). Every request is sent
+and answered in a thread of its own. Blocking pipes in threads work the same on Windows as elsewhere, unlike selectors
+on pipes. map() returns the results in request order.
+"""
+import atexit
+import importlib
+import os
+import pickle
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .headless import NoPythonError, installPreferences, preferencesSnapshot, pythonInterpreter, workerCommand
+
+HEADER = struct.Struct('<Q')
+
+
+class WorkerError(Exception):
+    """An exception in a worker, with the worker's traceback as message"""
+
+
+def writeFrame(f, obj):
+    data = pickle.dumps(obj, -1)
+    f.write(HEADER.pack(len(data)))
+    f.write(data)
+    f.flush()
+
+
+def readFrame(f):
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise EOFError('worker pipe closed')
+    size = HEADER.unpack(header)[0]
+    data = f.read(size)
+    if len(data) < size:
+        raise EOFError('worker pipe closed')
+    return pickle.loads(data)
+
+
+class Worker:
+    def __init__(self):
+        self.proc = subprocess.Popen(workerCommand('worker_pool.serve'), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def request(self, entry, args, preferences):
+        writeFrame(self.proc.stdin, (entry, args, preferences))
+        ok, result = readFrame(self.proc.stdout)
+        if not ok:
+            raise WorkerError(result)
+        return result
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+
+
+class WorkerPool:
+    """Up to 'size' workers, started when they are first needed"""
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._workers) < self.size:
+                worker = Worker()
+                self._workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def _run(self, entry, args, preferences):
+        worker = self._acquire()
+        try:
+            result = worker.request(entry, args, preferences)
+        except (EOFError, OSError):  # the worker died, the next request starts a new one
+            with self._lock:
+                self._workers.remove(worker)
+            worker.close()
+            raise
+        except BaseException:
+            self._idle.put(worker)
+            raise
+        self._idle.put(worker)
+        return result
+
+    def map(self, entry, args_list):
+        # type: (str, [tuple]) -> list
+        """entry(*args) for each of 'args_list' in the workers, the results in the same order"""
+        preferences = preferencesSnapshot()
+        return list(self._executor.map(lambda args: self._run(entry, args, preferences), args_list))
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+        self._executor.shutdown(wait=False)
+
+
+_pools = {}  # name -> WorkerPool
+_workers_available = None
+
+
+def workersAvailable():
+    # type: () -> bool
+    """Whether worker processes can be started. If not, the reason is printed once and the work is done in Anki"""
+    global _workers_available
+    if _workers_available is None:
+        from .util import printf  # not at the top: a worker imports util only after installPreferences()
+
+        try:
+            pythonInterpreter()
+            _workers_available = True
+        except NoPythonError as e:
+            printf('Not using worker processes: %s' % e)
+            _workers_available = False
+    return _workers_available
+
+
+def getWorkerPool(name, size):
+    # type: (str, int) -> WorkerPool
+    """The pool 'name', (re)started with 'size' workers if it doesn't exist yet or had another size"""
+    pool = _pools.get(name, None)
+    if pool is None or pool.size != size:
+        if pool is not None:
+            pool.close()
+        pool = _pools[name] = WorkerPool(size)
+    return pool
+
+
+@atexit.register
+def closeWorkerPools():
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+def splitChunks(items, n):
+    # type: (list, int) -> [list]
+    """'items' in up to 'n' contiguous chunks of about the same size"""
+    n = max(1, min(n, len(items)))
+    size, rest = divmod(len(items), n)
+    chunks, start = [], 0
+    for i in range(n):
+        end = start + size + (1 if i < rest else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def serve():
+    """Main loop of a worker process"""
+    requests = sys.stdin.buffer
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    # output of the add-on code must not end up between the frames
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    package = __name__.rsplit('.', 1)[0]
+    functions = {}
+    while True:
+        try:
+            entry, args, preferences = readFrame(requests)
+        except EOFError:
+            return
+        try:
+            installPreferences(preferences)
+            if entry not in functions:
+                module_name, function_name = entry.rsplit('.', 1)
+                module = importlib.import_module('%s.%s' % (package, module_name))
+                functions[entry] = getattr(module, function_name)
+            response = (True, functions[entry](*args))
+        except Exception:
+            response = (False, traceback.format_exc())
+        writeFrame(responses, response)